@@ -0,0 +1,211 @@
+import io
+import os
+import csv
+import sys
+import copy
+import json
+import argparse
+import datetime
+import multiprocessing
+from sim_runner import season_runner, load_data, WHEAT_FILE, ENV_FILE
+from weather import SITES, load_weather, season_weather
+
+DEFAULT_SOWING_DATE = '05-22'
+RESULT_FIELDS = ['id', 'site', 'year', 'co2', 'sowing_date', 'status', 'error', 'days', 'stage', 'flowering_day',
+                 'maturity_day', 'biomass_total', 'grain_biomass', 'nitrogen_total']
+
+
+def read_jobs(fname):
+    """Reads a JSONL job file, one job per line; a job without an id is given its line number"""
+    jobs = []
+    with open(fname) as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                job = json.loads(line)
+                job['id'] = str(job.get('id', number))
+                jobs.append(job)
+    return jobs
+
+
+def _complete_record(text, output_format):
+    """Whether the last record of the output is whole: a JSON object, or a CSV row with every result field"""
+    if output_format == 'csv':
+        try:
+            rows = list(csv.reader(io.StringIO(text, newline=''), strict=True))
+        except csv.Error:
+            return False
+        return len(rows[-1]) == len(RESULT_FIELDS)
+    try:
+        return isinstance(json.loads(text.rstrip('\n').rsplit('\n', 1)[-1]), dict)
+    except ValueError:
+        return False
+
+
+def truncate_incomplete(fname, output_format):
+    """Cuts an output file back to the end of its last complete record and returns the number of bytes removed"""
+    if not os.path.exists(fname):
+        return 0
+    with open(fname, 'rb') as f:
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    while end and not _complete_record(data[:end].decode(), output_format):
+        end = data.rfind(b'\n', 0, end - 1) + 1
+    if end < len(data):
+        with open(fname, 'r+b') as f:
+            f.truncate(end)
+    return len(data) - end
+
+
+def completed_ids(fname, output_format=None):
+    """Ids of the jobs already in an output file; lines cut short by an interruption are ignored"""
+    if not os.path.exists(fname):
+        return set()
+    output_format = output_format or ('csv' if fname.endswith('.csv') else 'jsonl')
+    with open(fname, newline='') as f:
+        if output_format == 'csv':
+            # DictReader fills the fields missing from a short row with None
+            return {row['id'] for row in csv.DictReader(f)
+                    if all(row.get(field) is not None for field in RESULT_FIELDS)}
+        ids = set()
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            ids.add(str(result['id']))
+        return ids
+
+
+def weather_file(site):
+    """Weather file of a site name from weather.SITES, or the site itself if it's a path"""
+    return SITES.get(site, site)
+
+
+def apply_overrides(plant_data, env_data, overrides):
+    """Sets env data, phase thermal times, phase modifiers and plant variables by name, in that order"""
+    phases = [name for name, value in plant_data['phases']]
+    for name, value in overrides.items():
+        if name in env_data:
+            env_data[name] = value
+        elif name in phases:
+            plant_data['phases'][phases.index(name)][1] = value
+        elif name in plant_data['phase_modifiers']:
+            plant_data['phase_modifiers'][name] = value
+        elif name in plant_data:
+            plant_data[name] = value
+        else:
+            raise Exception(f"Unknown parameter: {name}")
+
+
+def job_sowing_date(job, year, sowing_date):
+    """Sowing date of a job from 'MM-DD' or an ISO date, which must fall in the job's year after January 1"""
+    if len(sowing_date) == 5:
+        sowing_date = f'{year}-{sowing_date}'
+    try:
+        sowing_date = datetime.date.fromisoformat(sowing_date)
+    except ValueError:
+        raise ValueError(f"Job {job['id']}: invalid sowing date {sowing_date!r}") from None
+    if sowing_date.year != year or sowing_date == datetime.date(year, 1, 1):
+        # Seasons start the day before sowing, within the year's weather
+        raise ValueError(f"Job {job['id']}: sowing date {sowing_date} must be in {year}, after January 1")
+    return sowing_date
+
+
+def summarize(logs, phase_index):
+    """Final state of a run and the days it reached flowering and maturity (None if it didn't)"""
+    plant = logs['plant']
+    stage = list(plant['stage'])
+    def _phase_day(phase):
+        index = phase_index.index(phase)
+        return next((day for day, value in enumerate(stage, 1) if value >= index), None)
+    return {'days': len(stage),
+            'stage': stage[-1],
+            'flowering_day': _phase_day('flowering'),
+            'maturity_day': _phase_day('maturity'),
+            'biomass_total': plant['biomass_total'][-1],
+            'grain_biomass': logs['grain']['biomass_total'][-1] if 'grain' in logs else 0,
+            'nitrogen_total': plant['nitrogen_total'][-1]}
+
+
+def run_job(job):
+    """Runs one job and returns its result row, with status 'error' if it failed"""
+    site = job.get('site', 'colorado')
+    co2_concentration = job.get('co2', 350)
+    result = dict(id=job['id'], site=site, year=job.get('year'), co2=co2_concentration,
+                  sowing_date=job.get('sowing_date', DEFAULT_SOWING_DATE))
+    try:
+        year = int(job['year'])
+        sowing_date = job_sowing_date(job, year, result['sowing_date'])
+        plant_data = copy.deepcopy(load_data(WHEAT_FILE))
+        env_data = dict(load_data(ENV_FILE))
+        apply_overrides(plant_data, env_data, job.get('overrides', {}))
+        season = season_weather(year, sowing_date, weather_file(site))
+        try:
+            logs = season_runner(season, co2_concentration, plant_data=plant_data, env_data=env_data)
+        except ValueError as e:
+            raise ValueError(f"Job {job['id']}: the weather of {year} ends before harvest when sown on "
+                             f"{sowing_date}") from e
+        result.update(status='ok', error='', **summarize(logs, [name for name, value in plant_data['phases']]))
+    except Exception as e:
+        result.update(status='error', error=str(e))
+    return result
+
+
+def run_batch(jobs_file, output_file, workers=1, output_format=None, resume=True):
+    """Runs the jobs of a JSONL file, appending each result to output_file (JSONL or .csv) as its job finishes
+
+    With resume, jobs already in the output are skipped after cutting off a half-written last result.
+    """
+    output_format = output_format or ('csv' if output_file.endswith('.csv') else 'jsonl')
+    jobs = read_jobs(jobs_file)
+    if resume:
+        truncate_incomplete(output_file, output_format)
+        done = completed_ids(output_file, output_format)
+        jobs = [job for job in jobs if job['id'] not in done]
+    elif os.path.exists(output_file):
+        os.remove(output_file)
+
+    load_data(WHEAT_FILE)
+    load_data(ENV_FILE)
+    for site in set(job.get('site', 'colorado') for job in jobs):
+        if os.path.exists(weather_file(site)):
+            load_weather(weather_file(site))
+
+    new_file = not os.path.exists(output_file) or os.path.getsize(output_file) == 0
+    with open(output_file, 'a', newline='') as f:
+        if output_format == 'csv':
+            writer = csv.DictWriter(f, RESULT_FIELDS, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            write = writer.writerow
+        else:
+            write = lambda result: f.write(json.dumps(result) + '\n')
+
+        if workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.imap_unordered(run_job, jobs)
+                for result in results:
+                    write(result)
+                    f.flush()
+        else:
+            for job in jobs:
+                write(run_job(job))
+                f.flush()
+    return len(jobs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a JSONL file of simulation jobs')
+    parser.add_argument('jobs', help='JSONL job file, one {"id", "site", "year", "co2", "sowing_date", '
+                                     '"overrides"} per line')
+    parser.add_argument('output', help='results file, appended to as jobs finish (.jsonl or .csv)')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='output format, from the extension by default')
+    parser.add_argument('--restart', action='store_true', help='overwrite the output instead of resuming')
+    args = parser.parse_args(argv)
+    n_jobs = run_batch(args.jobs, args.output, args.workers, args.format, resume=not args.restart)
+    print(f'Ran {n_jobs} jobs', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import json
+import copy
+import datetime
+from phenology import Phenology, season_drivers
+
+# Parameters fitted by default: the germination parameters and the thermal time of each phase between
+# emergence and maturity
+CALIBRATION_PARAMS = ('shoot_lag', 'shoot_rate', 'end_of_juvenile', 'floral_initiation', 'flowering',
+                      'start_of_grain_filling', 'end_of_grain_filling')
+
+
+def load_observations(fname):
+    """Loads observed phase dates, a JSON list of {"year", "sowing_date", <phase>: date}, as days since sowing"""
+    with open(fname) as f:
+        records = json.load(f)
+    observations = []
+    for record in records:
+        record = dict(record)
+        year = record.pop('year')
+        sow_date = datetime.date.fromisoformat(record.pop('sowing_date'))
+        phases = {name: (datetime.date.fromisoformat(date) - sow_date).days for name, date in record.items()}
+        observations.append(dict(year=year, sow_date=sow_date, phases=phases))
+    return observations
+
+
+def nelder_mead(f, x0, steps, max_iter=2000, tol=1e-8):
+    """Minimizes f from x0 with the Nelder-Mead simplex, sized by steps along each dimension; returns (x, f(x))"""
+    n = len(x0)
+    simplex = [list(x0)]
+    for i in range(n):
+        x = list(x0)
+        x[i] += steps[i]
+        simplex.append(x)
+    values = [f(x) for x in simplex]
+
+    for iteration in range(max_iter):
+        order = sorted(range(n + 1), key=lambda i: values[i])
+        simplex = [simplex[i] for i in order]
+        values = [values[i] for i in order]
+        if values[-1] - values[0] <= tol:
+            break
+
+        centroid = [sum(x[i] for x in simplex[:-1]) / n for i in range(n)]
+        worst = simplex[-1]
+        def _towards(scale):
+            return [c + scale * (w - c) for c, w in zip(centroid, worst)]
+
+        reflected = _towards(-1)
+        f_reflected = f(reflected)
+        if f_reflected < values[0]:
+            expanded = _towards(-2)
+            f_expanded = f(expanded)
+            if f_expanded < f_reflected:
+                simplex[-1], values[-1] = expanded, f_expanded
+            else:
+                simplex[-1], values[-1] = reflected, f_reflected
+        elif f_reflected < values[-2]:
+            simplex[-1], values[-1] = reflected, f_reflected
+        else:
+            contracted = _towards(0.5 if f_reflected >= values[-1] else -0.5)
+            f_contracted = f(contracted)
+            if f_contracted < min(f_reflected, values[-1]):
+                simplex[-1], values[-1] = contracted, f_contracted
+            else:
+                # Shrink towards the best point
+                best = simplex[0]
+                for i in range(1, n + 1):
+                    simplex[i] = [b + 0.5 * (x - b) for b, x in zip(best, simplex[i])]
+                    values[i] = f(simplex[i])
+
+    best = min(range(n + 1), key=lambda i: values[i])
+    return simplex[best], values[best]
+
+
+class Calibration:
+
+    def __init__(self, plant_data, env_data, observations, params=CALIBRATION_PARAMS):
+        """Fits phase thermal times and germination parameters to observed phase dates"""
+        self.plant_data = plant_data
+        self.sowing_depth = env_data['sowing_depth']
+        self.observations = observations
+        self.params = list(params)
+        self.phenology = Phenology(plant_data, env_data)
+        self.germination = self.phenology.phase_index.index('germination')
+        self.drivers = [season_drivers(obs['year'], obs['sow_date']) for obs in observations]
+
+        phases = dict(plant_data['phases'])
+        self.x0 = [plant_data[name] if name in plant_data else phases[name] for name in self.params]
+        self.n_observed = sum(len(obs['phases']) for obs in observations)
+
+    def _set_params(self, x):
+        values = {name: max(value, 0) for name, value in zip(self.params, x)}
+        thermal_time = self.phenology.thermal_time
+        for name, value in values.items():
+            if name in self.phenology.phase_index:
+                thermal_time[self.phenology.phase_index.index(name)] = value
+        if 'shoot_lag' in values or 'shoot_rate' in values:
+            shoot_lag = values.get('shoot_lag', self.plant_data['shoot_lag'])
+            shoot_rate = values.get('shoot_rate', self.plant_data['shoot_rate'])
+            thermal_time[self.germination] = shoot_lag + self.sowing_depth * shoot_rate  # Equation 7
+        return values
+
+    def objective(self, x):
+        """Mean squared error in days between predicted phase starts and the middle of the observed days"""
+        self._set_params(x)
+        error = 0
+        for obs, drivers in zip(self.observations, self.drivers):
+            predicted = self.phenology.run(drivers)['fractional_days']
+            for name, day in obs['phases'].items():
+                predicted_day = predicted[name]
+                if predicted_day is None:
+                    predicted_day = len(drivers['tt_base'])
+                error += (predicted_day - (day - 0.5)) ** 2
+        return error / self.n_observed
+
+    def fit(self, max_iter=2000, tol=1e-8):
+        """Runs the optimizer from the current parameters and returns (fitted params, error)"""
+        steps = [0.1 * value if value else 1 for value in self.x0]
+        x, error = nelder_mead(self.objective, self.x0, steps, max_iter=max_iter, tol=tol)
+        return self._set_params(x), error
+
+    def calibrated_plant_data(self, fitted):
+        """Returns a copy of the plant data with the fitted values, ready to be saved as a params file"""
+        plant_data = copy.deepcopy(self.plant_data)
+        for name, value in fitted.items():
+            if name in plant_data:
+                plant_data[name] = value
+        plant_data['phases'] = [[name, fitted.get(name, value)] for name, value in plant_data['phases']]
+        return plant_data
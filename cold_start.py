@@ -0,0 +1,191 @@
+import os
+import sys
+import pickle
+import hashlib
+import datetime
+from plant_model import Plant
+from weather import SITES, get_env_conditions
+
+# Modules only needed to build the artifact or time the start up are imported inside those functions, so a worker
+# that only runs seasons imports no more than Plant needs
+
+ARTIFACT_FILE = 'data_files/static_inputs.pickle'
+WHEAT_FILE = 'data_files/wheat_data.json'
+ENV_FILE = 'data_files/env_data.json'
+
+_artifacts = {}
+
+
+def _tables(data):
+    """Turns the interpolation tables (lists of numbers) of a params dict into tuples, so plants can share them"""
+    return {key: tuple(value) if isinstance(value, list) and all(isinstance(v, (int, float)) for v in value)
+            else value for key, value in data.items()}
+
+
+def _digest(source):
+    """Hash of a source file's content, which unlike its modification time survives copies and checkouts"""
+    with open(source, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_artifact(fname=ARTIFACT_FILE, sites=None):
+    """Precompiles everything a run reads from disk into one indexed file
+
+    Layout: header length, header pickle (params, weather index, source hashes), then one pickle per site-year.
+    """
+    import json
+    import tempfile
+    from weather import load_weather
+    sites = sites or SITES
+    with open(WHEAT_FILE) as f:
+        plant_data = json.load(f)
+    with open(ENV_FILE) as f:
+        env_data = json.load(f)
+    plant_data = _tables(plant_data)
+    plant_data['phase_modifiers'] = _tables(plant_data['phase_modifiers'])
+
+    blobs = []
+    index = {}
+    offset = 0
+    for site, weather_file in sites.items():
+        labels, years = load_weather(weather_file)
+        index[site] = {}
+        for year, rows in years.items():
+            columns = {label: tuple(float(row[i]) for row in rows) for i, label in enumerate(labels)}
+            blob = pickle.dumps(columns, pickle.HIGHEST_PROTOCOL)
+            index[site][int(year)] = (offset, len(blob))
+            offset += len(blob)
+            blobs.append(blob)
+
+    sources = [WHEAT_FILE, ENV_FILE] + list(sites.values())
+    header = pickle.dumps({'sources': {source: _digest(source) for source in sources},
+                           'plant_data': plant_data,
+                           'env_data': env_data,
+                           'weather_index': index}, pickle.HIGHEST_PROTOCOL)
+    # Moved into place once written, so workers never load a partial file; builds of the same sources are identical
+    descriptor, temp_fname = tempfile.mkstemp(suffix='.tmp', prefix=os.path.basename(fname) + '.',
+                                              dir=os.path.dirname(os.path.abspath(fname)))
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            f.writelines(blobs)
+        os.chmod(temp_fname, 0o644)
+        os.replace(temp_fname, fname)
+    except BaseException:
+        os.remove(temp_fname)
+        raise
+
+
+def load_artifact(fname=ARTIFACT_FILE):
+    """Loads the artifact header once per process, building the artifact first if it's missing or stale"""
+    if fname in _artifacts:
+        return _artifacts[fname]
+    artifact = None
+    if os.path.exists(fname):
+        with open(fname, 'rb') as f:
+            header_size = int.from_bytes(f.read(8), 'little')
+            artifact = pickle.loads(f.read(header_size))
+        if any(not os.path.exists(source) or _digest(source) != digest
+               for source, digest in artifact['sources'].items()):
+            artifact = None
+    if artifact is None:
+        build_artifact(fname)
+        return load_artifact(fname)
+    artifact.update(fname=fname, weather_start=8 + header_size, weather={})
+    _artifacts[fname] = artifact
+    return artifact
+
+
+def year_weather(artifact, year, site='colorado'):
+    """Reads one year of a site's weather from the artifact as {label: tuple of floats}, once per process"""
+    key = (site, year)
+    if key not in artifact['weather']:
+        position = artifact['weather_index'][site].get(year)
+        if not position:
+            raise Exception("No data found for given year")
+        offset, size = position
+        with open(artifact['fname'], 'rb') as f:
+            f.seek(artifact['weather_start'] + offset)
+            artifact['weather'][key] = pickle.loads(f.read(size))
+    return artifact['weather'][key]
+
+
+def season_weather(artifact, year, sow_date, site='colorado'):
+    """Season from the sowing date to the end of the year, in the format of weather.season_weather"""
+    start = (sow_date - datetime.date(year, 1, 1)).days - 1
+    return {label: values[start:] for label, values in year_weather(artifact, year, site).items()}
+
+
+def run_season(year=1979, co2_concentration=350, sow_date=None, site='colorado', fname=ARTIFACT_FILE):
+    """Runs one season from the artifact alone and returns the plant's logs, as sim_runner would"""
+    artifact = load_artifact(fname)
+    sow_date = sow_date or datetime.date(year, 5, 22)
+    season = season_weather(artifact, year, sow_date, site)
+    plant = Plant(dict(artifact['plant_data']), dict(artifact['env_data']))  # Plant only pops from the top level
+    day = 0
+    while not plant.phase_name.startswith('harvest'):
+        plant.step(get_env_conditions(season, day, co2_concentration))
+        day += 1
+    return plant.get_logs()
+
+
+# Timed in a fresh interpreter each, as a short-lived worker would start
+_BASELINE = '''import time
+start = time.perf_counter()
+from sim_runner import sim_runner
+imported = time.perf_counter()
+from weather import season_weather
+import datetime
+season_weather({year}, datetime.date({year}, 5, 22))
+loaded = time.perf_counter()
+sim_runner({year})
+'''
+_COLD_START = '''import time
+start = time.perf_counter()
+from cold_start import load_artifact, run_season
+imported = time.perf_counter()
+from cold_start import year_weather
+year_weather(load_artifact(), {year})
+loaded = time.perf_counter()
+run_season({year})
+'''
+_TIMINGS = '''
+done = time.perf_counter()
+import sys, json
+print(json.dumps(dict(import_time=imported - start, load_time=loaded - imported, run_time=done - loaded,
+                      modules=len(sys.modules))))
+'''
+
+
+def cold_start_report(year=1985, repeats=5):
+    """Median times of import, data loading and one season for the json and artifact paths, in fresh interpreters"""
+    import json
+    import time
+    import subprocess
+    load_artifact()
+    lines = [f'Cold start, median of {repeats} fresh interpreters, season {year} (ms)',
+             f'{"path":<12}{"import":>10}{"load":>10}{"run":>10}{"total":>10}{"process":>10}{"modules":>10}']
+    for name, script in [('json', _BASELINE), ('artifact', _COLD_START)]:
+        runs = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', script.format(year=year) + _TIMINGS], check=True,
+                                    capture_output=True, text=True).stdout
+            timings = json.loads(output)
+            timings['process_time'] = time.perf_counter() - start
+            runs.append(timings)
+        median = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+        total = median['import_time'] + median['load_time'] + median['run_time']
+        lines.append(f'{name:<12}{median["import_time"] * 1000:>10.1f}{median["load_time"] * 1000:>10.1f}'
+                     f'{median["run_time"] * 1000:>10.1f}{total * 1000:>10.1f}{median["process_time"] * 1000:>10.1f}'
+                     f'{median["modules"]:>10}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # python cold_start.py [build | report]
+    if len(sys.argv) > 1 and sys.argv[1] == 'build':
+        build_artifact()
+    else:
+        print(cold_start_report())
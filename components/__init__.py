@@ -1,7 +1,13 @@
+import importlib
+from components.log_policies import FullLog, EveryNthDay, RingBuffer, PhaseAggregates
 from components.base_component import BaseComponent
-from components.root import Root
-from components.leaf import Leaf
-from components.grain import Grain
-from components.pod import Pod
-from components.head import Head
-from components.stem import Stem
+from components.registry import COMPONENTS, register_component, component_class
+
+
+def __getattr__(name):
+    # Organ classes are imported on first use from the modules they are registered with, so a crop only loads
+    # the modules of the organs it declares
+    for module, class_name in COMPONENTS.values():
+        if class_name == name:
+            return getattr(importlib.import_module(module), name)
+    raise AttributeError(f"module 'components' has no attribute '{name}'")
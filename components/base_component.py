@@ -1,5 +1,11 @@
 class BaseComponent:
 
+    # Organ name of the nitrogen concentration curves in phase_modifiers (y_n_conc_<limit>_<n_organ>), if any
+    n_organ = None
+
+    # Daily inputs passed to partition() after the available biomass: env_conditions, total_daily_accumulation, step_tt
+    partition_inputs = ()
+
     def __init__(self, plant, parent=None):
         self.plant = plant
         self.parent = parent
@@ -11,13 +17,12 @@ class BaseComponent:
         self.biomass_non_structural = 0
         self.unfulfilled_total = 0
 
+        self.nitrogen = 0
+        self.nitrogen_factor_cache = (None, None)
+        self.demand_cache = {}
+
     def log(self, field, value):
-        if field not in self.logs:
-            self.logs[field] = []
-        log = self.logs[field]
-        while len(log) < self.plant.age - 1:
-            log.append(0)
-        log.append(value)
+        self.plant.log_policy.log(self.logs, field, value, self.plant)
 
     def biomass(self, subtype=None):
         if not subtype:
@@ -29,5 +34,46 @@ class BaseComponent:
         else:
             raise Exception("Unknown biomass subtype:", subtype)
 
+    def _cache_today(self, demand):
+        """Keeps today's demand for calls without inputs; only today's, so memory stays bounded"""
+        self.demand_cache = {self.plant.age: demand}
+        return demand
+
     def unfulfilled(self):
         return self.unfulfilled_total + sum([c.unfulfilled() for c in self.components.values()])
+
+    def nitrogen_total(self):
+        return self.nitrogen + sum([c.nitrogen_total() for c in self.components.values()])
+
+    def nitrogen_limits(self):
+        """Today's minimum, critical and maximum nitrogen concentration, shared through the plant"""
+        return self.plant.n_concentrations[self.n_organ]
+
+    def nitrogen_demand(self):
+        """Nitrogen needed to bring the organ up to its maximum concentration"""
+        if not self.n_organ:
+            return 0
+        return max(0, self.nitrogen_limits()['max'] * self.biomass_total - self.nitrogen)
+
+    def nitrogen_available(self):
+        """Nitrogen that can be retranslocated, down to the minimum concentration"""
+        if not self.n_organ:
+            return 0
+        return max(0, self.nitrogen - self.nitrogen_limits()['min'] * self.biomass_total)
+
+    def nitrogen_factor(self):
+        """Nitrogen status between the minimum (0) and critical (1) concentration, calculated once per day"""
+        age, nitrogen_factor = self.nitrogen_factor_cache
+        if age == self.plant.age:
+            return nitrogen_factor
+        nitrogen_factor = self._calc_nitrogen_factor(self.nitrogen_limits())
+        self.log(f'{self.n_organ}_nitrogen_factor', nitrogen_factor)
+        self.nitrogen_factor_cache = (self.plant.age, nitrogen_factor)
+        return nitrogen_factor
+
+    def _calc_nitrogen_factor(self, limits):
+        """Nitrogen factor of the organ's overall concentration"""
+        nitrogen_concentration = self.nitrogen / self.biomass_total if self.biomass_total > 0 else 0
+        co2_factor = 1
+        nitrogen_factor = (nitrogen_concentration - limits['min']) / ((limits['crit'] * co2_factor) - limits['min'])
+        return min(max(nitrogen_factor, 0), 1)
@@ -7,7 +7,6 @@ class Grain(BaseComponent):
         super().__init__(plant, parent)
         self.biomass_total = self.plant.vars['meal_dm_init']
         self.n_grains = None
-        self.demand_cache = {}
 
     def partition(self, available_biomass):
         self.biomass_total += available_biomass
@@ -63,8 +62,13 @@ class Grain(BaseComponent):
         grain_demand = min(grain_demand, max_demand)
 
         self.log('grain_demand', grain_demand)
-        self.demand_cache[self.plant.age] = grain_demand
-        return min(grain_demand, max_demand)
+        return self._cache_today(grain_demand)
+
+    def nitrogen_demand(self):
+        # Grains fill with nitrogen after flowering, once their number is set
+        if 'postflowering' not in self.plant.phase_composite_phases or not self.n_grains:
+            return 0
+        return self.n_grains * self.plant.vars['potential_grain_n_filling_rate']
 
     def retranslocate_to(self, amount):
         self.biomass_total += amount
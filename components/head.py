@@ -1,12 +1,9 @@
-from components import BaseComponent, Grain, Pod
+from components import BaseComponent
 from utils import interpolate
 
 class Head(BaseComponent):
 
-    def __init__(self, plant, parent=None):
-        super().__init__(plant, parent)
-        self.components['grain'] = Grain(plant, self)
-        self.components['pod'] = Pod(plant, self)
+    partition_inputs = ('env_conditions', 'total_daily_accumulation')
 
     def partition(self, available_biomass, env_conditions, total_daily_accumulation):
         grain = self.components['grain']
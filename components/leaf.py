@@ -1,8 +1,12 @@
 from components.base_component import BaseComponent
+from components.leaf_cohorts import LeafCohorts
 from utils import interpolate
 
 class Leaf(BaseComponent):
 
+    n_organ = 'leaf'
+    partition_inputs = ('step_tt',)
+
     def __init__(self, plant, parent=None):
         super().__init__(plant, parent)
         self.biomass_total = self.plant.vars['leaf_dm_init']
@@ -12,8 +16,20 @@ class Leaf(BaseComponent):
         self.biomass_senescence = 0
         self.leaf_senescence = 0
         self.lai_senescence = 0
+        self.cohorts = LeafCohorts(self.n_leaves, self.lai, self.plant.vars['node_no_correction'])
+
+    def _sync_cohorts(self):
+        """Cohorts take up the nitrogen the plant gave or took from the leaf since they were last updated"""
+        self.cohorts.add_nitrogen(self.nitrogen - self.cohorts.nitrogen_total)
+
+    def _calc_nitrogen_factor(self, limits):
+        """Nitrogen factor of the green leaves, leaf by leaf (see LeafCohorts.nitrogen_factor)"""
+        self._sync_cohorts()
+        return self.cohorts.nitrogen_factor(self.biomass_total, limits['min'], limits['crit'])
 
     def partition(self, available_biomass, step_tt):
+        self._sync_cohorts()
+
         # Biomass
         leaf_fraction = interpolate(self.plant.phase_modifiers['x_stage_no_partition'],
                                     self.plant.phase_modifiers['y_frac_leaf'],
@@ -29,24 +45,11 @@ class Leaf(BaseComponent):
 
         return available_biomass - biomass_leaf
 
-    def nitrogen_factor(self):
-        nitrogen_concentration = 0.0001
-        nitrogen_critical = interpolate(self.plant.phase_modifiers['x_stage_code'],
-                                        self.plant.phase_modifiers['y_n_conc_crit_leaf'],
-                                        self.plant.stage)
-        nitrogen_minimum = interpolate(self.plant.phase_modifiers['x_stage_code'],
-                                       self.plant.phase_modifiers['y_n_conc_min_leaf'],
-                                       self.plant.stage)
-        co2_factor = 1
-        nitrogen_factor = (nitrogen_concentration - nitrogen_minimum) / ((nitrogen_critical * co2_factor) - nitrogen_minimum)
-        self.log('leaf_nitrogen_factor', nitrogen_factor)
-        return nitrogen_factor
-
     def growth(self, biomass_leaf, step_tt):
         # Stress factors for canopy expansion
         nitrogen_sce = 1
         phosphorus_sce = 1
-        water_sce = 1
+        water_sce = self.plant.water_stress_expansion
 
         # Node formation potential
         potential_node_formation_rate = interpolate(self.plant.vars['x_node_no_app'],
@@ -86,13 +89,14 @@ class Leaf(BaseComponent):
         self.lai += lai_increase
 
         # Leaf formation actual
-        lai_stressed_factor = lai_increase / lai_increase_stressed
+        lai_stressed_factor = lai_increase / lai_increase_stressed if lai_increase_stressed > 0 else 0
         lai_increase_factor = interpolate(self.plant.vars['x_lai_ratio'],
                                           self.plant.vars['y_leaf_no_fraction'],
                                           lai_stressed_factor)
         actual_leaf_increase = potential_leaf_increase * lai_increase_factor
         self.log('actual_leaf_increase', actual_leaf_increase)
         self.n_leaves += actual_leaf_increase
+        self.cohorts.expand(actual_leaf_increase, lai_increase, step_tt)
         self.log('nodes', self.n_nodes)
         self.log('leaves', self.n_leaves)
         self.log('lai', self.lai)
@@ -105,8 +109,8 @@ class Leaf(BaseComponent):
         self.n_leaves -= leaf_senescence
         self.log('leaf_senescence', leaf_senescence)
 
-        # Leaf area (lai) senescence
-        sen_age = leaf_senescence * (self.lai / self.n_leaves)
+        # Leaf area (lai) senescence, of the oldest green leaves
+        sen_age = self.cohorts.senescing_area(leaf_senescence)
         sen_water_stress = 0
         sen_light_intensity = 0
         sen_frost = 0
@@ -118,6 +122,13 @@ class Leaf(BaseComponent):
         self.log('lai_senescence', lai_senescence)
 
         # Biomass senescence
-        biomass_senescence = biomass_leaf * (lai_senescence / self.lai)
+        biomass_senescence = min(biomass_leaf * (lai_senescence / self.lai), self.biomass_total)
         self.biomass_total -= biomass_senescence
         self.log('biomass_senescence', biomass_senescence)
+
+        # Senesced leaf keeps its minimum nitrogen concentration
+        nitrogen_senescence = min(self.nitrogen, biomass_senescence * self.nitrogen_limits()['min'])
+        nitrogen_senescence = self.cohorts.senesce(leaf_senescence, lai_senescence, nitrogen_senescence)
+        self.nitrogen -= nitrogen_senescence
+        self.log('nitrogen_senescence', nitrogen_senescence)
+        self.log('green_leaves', self.cohorts.green_leaves())
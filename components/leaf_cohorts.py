@@ -0,0 +1,139 @@
+import math
+import numpy as np
+
+
+class LeafCohorts:
+
+    def __init__(self, n_leaves, area, growing_leaves, size=32):
+        """Leaf area, age and nitrogen of each node of a plant in preallocated arrays, oldest node first
+
+        Positions are fractional: appeared leaves, then growing_leaves still expanding; senesced counts from the oldest.
+        """
+        self.area = np.zeros(size)
+        self.senesced_area = np.zeros(size)
+        self.nitrogen = np.zeros(size)
+        self.appearance = np.zeros(size)  # Thermal time at which each leaf appeared
+        self.growing_leaves = growing_leaves
+        self.thermal_time = 0
+        self.appeared = 0
+        self.senesced = 0
+        self.oldest = 0  # First node with green area
+        self.nitrogen_total = 0
+
+        first, share = self._span(0, n_leaves)
+        self._reserve(first + len(share))
+        self.area[first:first + len(share)] = area * share / share.sum()
+        self.appeared = n_leaves
+        self.end = math.ceil(n_leaves + growing_leaves)
+
+    def _span(self, start, end):
+        """First node and share of each node covered by the leaf positions from start to end"""
+        first = int(start)
+        nodes = range(first, max(math.ceil(end), first + 1))
+        return first, np.array([min(end, node + 1) - max(start, node) for node in nodes])
+
+    def _reserve(self, size):
+        """Grows the arrays to hold at least size nodes, doubling so growth stays rare"""
+        if size <= len(self.area):
+            return
+        size = max(size, 2 * len(self.area))
+        for name in ['area', 'senesced_area', 'nitrogen', 'appearance']:
+            values = getattr(self, name)
+            setattr(self, name, np.concatenate([values, np.zeros(size - len(values))]))
+
+    def _window(self):
+        """Nodes from the oldest green leaf to the youngest expanding one"""
+        return slice(self.oldest, self.end)
+
+    def green_leaves(self):
+        return self.appeared - self.senesced
+
+    def age(self):
+        """Thermal time since each appeared leaf appeared"""
+        return self.thermal_time - self.appearance[:math.ceil(self.appeared)]
+
+    def expand(self, leaf_increase, area_increase, step_tt):
+        """Makes leaf_increase new leaves appear and shares area_increase evenly between the expanding leaves"""
+        self.thermal_time += step_tt
+        if leaf_increase > 0:
+            appeared = self.appeared + leaf_increase
+            self._reserve(math.ceil(appeared + self.growing_leaves))
+            self.appearance[math.ceil(self.appeared):math.ceil(appeared)] = self.thermal_time
+            self.appeared = appeared
+            self.end = math.ceil(appeared + self.growing_leaves)
+        if area_increase > 0:
+            first, share = self._span(self.appeared, self.appeared + self.growing_leaves)
+            self._reserve(first + len(share))
+            self.area[first:first + len(share)] += share * (area_increase / share.sum())
+            self.oldest = min(self.oldest, first)
+
+    def senescing_area(self, leaves):
+        """Green area of the next leaves to senesce, the oldest, each losing its share of the area it grew to"""
+        first, share = self._span(self.senesced, min(self.appeared, self.senesced + leaves))
+        nodes = slice(first, first + len(share))
+        area = self.area[nodes]
+        return float(np.minimum(share * (area + self.senesced_area[nodes]), area).sum())
+
+    def nitrogen_factor(self, biomass, n_min, n_crit):
+        """Area-weighted nitrogen factor of the green leaves, each holding a share of biomass by its area"""
+        window = self._window()
+        area = self.area[window]
+        green_area = area.sum()
+        if biomass <= 0 or green_area <= 0:
+            return 0
+        # area * clip(factor, 0, 1) is clip(area * factor, 0, area), which leaves out nodes without area
+        factor = self.nitrogen[window] * (green_area / biomass) - n_min * area
+        factor /= n_crit - n_min
+        np.minimum(factor, area, out=factor)
+        return float(np.maximum(factor, 0, out=factor).sum()) / green_area
+
+    def senesce(self, leaves, area, nitrogen):
+        """Removes area from the oldest green leaves first, with nitrogen in proportion; returns the nitrogen removed"""
+        self.senesced = min(self.appeared, self.senesced + leaves)
+        if area <= 0:
+            return 0
+        window = self._window()
+        green = self.area[window]
+        lost = np.cumsum(green)
+        lost -= green
+        np.subtract(area, lost, out=lost)
+        np.minimum(np.maximum(lost, 0, out=lost), green, out=lost)
+        green -= lost
+        self.senesced_area[window] += lost
+        nitrogen_lost = 0
+        total_lost = lost.sum()
+        if nitrogen > 0 and total_lost > 0:
+            node_nitrogen = np.minimum(lost * (nitrogen / total_lost), self.nitrogen[window])
+            self.nitrogen[window] -= node_nitrogen
+            nitrogen_lost = node_nitrogen.sum()
+            self.nitrogen_total -= nitrogen_lost
+            # Leaves that grew today don't hold their nitrogen yet, so the rest comes from the other green leaves
+            shortfall = min(nitrogen - nitrogen_lost, self.nitrogen_total)
+            if shortfall > 0:
+                self.add_nitrogen(-shortfall)
+                nitrogen_lost += shortfall
+        still_green = green.nonzero()[0]
+        self.oldest += int(still_green[0]) if len(still_green) else len(green)
+        if self.oldest == window.start:
+            return nitrogen_lost
+
+        # What fully senesced leaves still hold stays in the green leaves
+        dead = slice(window.start, self.oldest)
+        leftover = self.nitrogen[dead].sum()
+        if leftover > 0:
+            self.nitrogen[dead] = 0
+            self.nitrogen_total -= leftover
+            self.add_nitrogen(leftover)
+        return nitrogen_lost
+
+    def add_nitrogen(self, nitrogen):
+        """Shares nitrogen gained between the green leaves by area, and nitrogen lost by the nitrogen they hold"""
+        if nitrogen == 0:
+            return
+        window = self._window()
+        weights = self.area[window] if nitrogen > 0 else self.nitrogen[window]
+        total = weights.sum()
+        if total <= 0:
+            return
+        self.nitrogen[window] += weights * (nitrogen / total)
+        self.nitrogen_total += nitrogen
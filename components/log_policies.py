@@ -0,0 +1,71 @@
+import collections
+
+
+class FullLog:
+    """Keeps every logged value, padding days a field wasn't logged with 0 so list index = age - 1"""
+
+    def log(self, logs, field, value, plant):
+        if field not in logs:
+            logs[field] = []
+        log = logs[field]
+        while len(log) < plant.age - 1:
+            log.append(0)
+        log.append(value)
+
+
+class EveryNthDay:
+    """Keeps the values of every nth day only, starting on day 1, so list index = (age - 1) / n"""
+
+    def __init__(self, n):
+        self.n = n
+
+    def log(self, logs, field, value, plant):
+        if (plant.age - 1) % self.n:
+            return
+        if field not in logs:
+            logs[field] = []
+        log = logs[field]
+        while len(log) < (plant.age - 1) // self.n:
+            log.append(0)
+        log.append(value)
+
+
+class _Ring(collections.deque):
+    """A deque that also counts how many days have passed through it"""
+    days = 0
+
+
+class RingBuffer:
+    """Keeps only the values of the last k days, padded with 0 like FullLog"""
+
+    def __init__(self, k):
+        self.k = k
+
+    def log(self, logs, field, value, plant):
+        if field not in logs:
+            logs[field] = _Ring(maxlen=self.k)
+        log = logs[field]
+        missing = plant.age - 1 - log.days
+        if missing > 0:
+            log.extend([0] * min(missing, self.k))
+            log.days += missing
+        log.append(value)
+        log.days += 1
+
+
+class PhaseAggregates:
+    """Keeps {phase_name: {'min', 'mean', 'max', 'sum', 'count'}} of each field, by the phase each day started in"""
+
+    def log(self, logs, field, value, plant):
+        if field not in logs:
+            logs[field] = {}
+        phases = logs[field]
+        aggregate = phases.get(plant.day_phase_name)
+        if aggregate is None:
+            phases[plant.day_phase_name] = dict(min=value, mean=value, max=value, sum=value, count=1)
+            return
+        aggregate['min'] = min(aggregate['min'], value)
+        aggregate['max'] = max(aggregate['max'], value)
+        aggregate['sum'] += value
+        aggregate['count'] += 1
+        aggregate['mean'] = aggregate['sum'] / aggregate['count']
@@ -3,9 +3,10 @@ from utils import interpolate
 
 class Pod(BaseComponent):
 
+    n_organ = 'pod'
+
     def __init__(self, plant, parent=None):
         super().__init__(plant, parent)
-        self.demand_cache = {}
 
         initial_biomass = self.plant.vars['pod_dm_init']
         self.structural_fraction = 0
@@ -45,8 +46,7 @@ class Pod(BaseComponent):
         else:
             pod_demand = total_daily_accumulation * pod_demand_fraction
 
-        self.demand_cache[self.plant.age] = pod_demand
-        return pod_demand
+        return self._cache_today(pod_demand)
 
     def retranslocate_from(self, target):
         actual = min(target, self.biomass_non_structural)
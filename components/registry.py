@@ -0,0 +1,24 @@
+import importlib
+
+# Component name used in crop definitions -> (module, class), imported the first time a crop uses it
+COMPONENTS = {
+    'root': ('components.root', 'Root'),
+    'leaf': ('components.leaf', 'Leaf'),
+    'head': ('components.head', 'Head'),
+    'grain': ('components.grain', 'Grain'),
+    'pod': ('components.pod', 'Pod'),
+    'stem': ('components.stem', 'Stem'),
+}
+
+
+def register_component(name, module, class_name):
+    """Makes a component class available to crop definitions without importing its module yet"""
+    COMPONENTS[name] = (module, class_name)
+
+
+def component_class(name):
+    """Imports and returns the component class registered under name"""
+    if name not in COMPONENTS:
+        raise Exception("Unknown component:", name)
+    module, class_name = COMPONENTS[name]
+    return getattr(importlib.import_module(module), class_name)
@@ -1,13 +1,17 @@
+import math
 from components.base_component import BaseComponent
 from utils import interpolate
 
 class Root(BaseComponent):
 
+    partition_inputs = ('env_conditions',)
+
     def __init__(self, plant, parent=None):
         super().__init__(plant, parent)
         self.biomass_total = self.plant.vars['root_dm_init']
         self.root_length = 0
         self.root_senescence = 0
+        self.root_depth = self.plant.sowing_depth
 
     def partition(self, available_biomass, env_conditions):
         root_ratio = interpolate(self.plant.phase_modifiers['x_stage_no_partition'],
@@ -32,16 +36,20 @@ class Root(BaseComponent):
         temperature_factor = interpolate(self.plant.vars['x_temp_root_advance'],
                                          self.plant.vars['y_rel_root_advance'],
                                          env_conditions['air_temp_mean'])
-        soil_water_stress_photosynthesis = 1
+        soil_water_stress_photosynthesis = self.plant.water_stress_photo
         soil_water_factor = interpolate(self.plant.vars['x_ws_root'],
                                         self.plant.vars['y_ws_root_fac'],
                                         soil_water_stress_photosynthesis)
-        soil_water_available_factor = 1  # From soil module
+        soil_water_available_factor = interpolate(self.plant.vars['x_sw_ratio'],
+                                                  self.plant.vars['y_sw_fac_root'],
+                                                  env_conditions.get('root_front_water_ratio', 1))
         root_exploration_factor = 1      # From soil module
         root_depth_growth = root_depth_growth_rate * \
                             temperature_factor * \
                             min(soil_water_factor, soil_water_available_factor) * \
                             root_exploration_factor
+        self.root_depth = min(self.root_depth + root_depth_growth, env_conditions.get('soil_depth', math.inf))
+        self.log('root_depth', self.root_depth)
 
         # Root length
         daily_root_length = biomass_root * self.plant.vars['specific_root_length']
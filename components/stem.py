@@ -3,6 +3,8 @@ from utils import interpolate
 
 class Stem(BaseComponent):
 
+    n_organ = 'stem'
+
     def __init__(self, plant, parent=None):
         super().__init__(plant, parent)
 
@@ -38,15 +40,3 @@ class Stem(BaseComponent):
         self.log('biomass_stem_retranslocated', actual)
         return actual
 
-    def nitrogen_factor(self):
-        nitrogen_concentration = 0.0001
-        nitrogen_critical = interpolate(self.plant.phase_modifiers['x_stage_code'],
-                                        self.plant.phase_modifiers['y_n_conc_crit_stem'],
-                                        self.plant.stage)
-        nitrogen_minimum = interpolate(self.plant.phase_modifiers['x_stage_code'],
-                                       self.plant.phase_modifiers['y_n_conc_min_stem'],
-                                       self.plant.stage)
-        co2_factor = 1
-        nitrogen_factor = (nitrogen_concentration - nitrogen_minimum) / ((nitrogen_critical * co2_factor) - nitrogen_minimum)
-        self.log('stem_nitrogen_factor', nitrogen_factor)
-        return nitrogen_factor
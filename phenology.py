@@ -0,0 +1,191 @@
+import datetime
+import functools
+import numpy as np
+from weather import season_weather, WEATHER_FILE
+
+
+def crown_temperature(temp, snow_height):
+    """Crown temperature from air temperature, insulated by snow below zero (Equations 1, 2)"""
+    if temp >= 0:
+        return temp
+    return 2 + temp * (0.4 + 0.0018 * (snow_height - 15) ** 2)
+
+
+def base_thermal_time(crown_t_mean):
+    """Daily thermal time from the mean crown temperature (Equation 4)"""
+    if crown_t_mean <= 0:
+        return 0
+    elif crown_t_mean <= 26:
+        return crown_t_mean
+    elif crown_t_mean <= 34:
+        return 26 / 8 * (34 - crown_t_mean)
+    else:
+        return 0
+
+
+def photoperiod_factor(day_length, photop_sens):
+    """Photoperiod penalizes growth based on the amount of available daylight (Equation 8)"""
+    return 1 - 0.002 * photop_sens * (20 - day_length) ** 2
+
+
+def update_vernalisation(vernalisation, t_max, t_min, crown_t_mean):
+    """Vernalisation accumulates on cold days and is lost on hot days (Equations 9, 10, 11)"""
+    if t_max < 30 and t_min < 15:
+        v0 = 1.4 - 0.0778 * crown_t_mean
+        v1 = 0.5 + 13.44 * (crown_t_mean / ((t_max - t_min + 3) ** 2))
+        vernalisation += min(v0, v1)
+    elif t_max > 30 and vernalisation < 10:
+        v0 = 0.5 * (t_max - 30)
+        vernalisation -= min(v0, vernalisation)
+    return vernalisation
+
+
+def vernalisation_factor(vernalisation, vern_sens):
+    """Penalizes growth until the plant is vernalised (Equation 12)"""
+    return 1 - (0.0054545 * vern_sens + 0.0003) * (50 - vernalisation)
+
+
+HOURS = np.arange(24)
+HOUR_OF_MAX = 14  # Hour of the daily maximum, with the minimum 12 hours before
+
+
+def diurnal_temperature(air_temp_max, air_temp_min):
+    """Hourly air temperatures of each day, shape (..., 24), following a cosine between the daily extremes"""
+    air_temp_max = np.asarray(air_temp_max, dtype=float)[..., None]
+    air_temp_min = np.asarray(air_temp_min, dtype=float)[..., None]
+    return (air_temp_max + air_temp_min) / 2 + \
+           (air_temp_max - air_temp_min) / 2 * np.cos(2 * np.pi * (HOURS - HOUR_OF_MAX) / 24)
+
+
+def sub_daily_thermal_time(air_temp_max, air_temp_min, snow_height):
+    """Daily thermal time as the mean of Equations 1, 2 and 4 over each hour of the diurnal curve, for arrays of days"""
+    temp = diurnal_temperature(air_temp_max, air_temp_min)
+    snow_height = np.asarray(snow_height, dtype=float)[..., None]
+    crown_t = np.where(temp >= 0, temp, 2 + temp * (0.4 + 0.0018 * (snow_height - 15) ** 2))
+    thermal_time = np.where(crown_t <= 26, crown_t, 26 / 8 * (34 - crown_t))
+    thermal_time = np.where((crown_t <= 0) | (crown_t > 34), 0, thermal_time)
+    return thermal_time.mean(axis=-1)
+
+
+@functools.lru_cache(maxsize=None)
+def year_drivers(year, fname=WEATHER_FILE, sub_daily=False):
+    """Cached daily phenology drivers of a whole site-year, which don't depend on the plant parameters"""
+    year_weather = season_weather(year, datetime.date(year, 1, 2), fname)  # Sown on Jan 2, a season starts on Jan 1
+    return thermal_drivers(year_weather['maxt'], year_weather['mint'], year_weather['snow'], year_weather['dayL'],
+                           sub_daily)
+
+
+def season_drivers(year, sow_date, fname=WEATHER_FILE, sub_daily=False):
+    """Daily phenology drivers of a season, sliced from the drivers of its year as weather.season_weather slices"""
+    start = (sow_date - datetime.date(year, 1, 1)).days - 1
+    return {key: values[start:] for key, values in year_drivers(year, fname, sub_daily).items()}
+
+
+def thermal_drivers(air_temp_max, air_temp_min, snow_height, day_length, sub_daily=False):
+    """Precomputes the parameter-free parts of Plant._calc_thermal_time for a sequence of days"""
+    crown_t_mean = tuple((crown_temperature(t_max, snow) + crown_temperature(t_min, snow)) / 2
+                         for t_max, t_min, snow in zip(air_temp_max, air_temp_min, snow_height))
+    if sub_daily:
+        tt_base = tuple(sub_daily_thermal_time(air_temp_max, air_temp_min, snow_height).tolist())
+    else:
+        tt_base = tuple(base_thermal_time(t) for t in crown_t_mean)
+    return {'air_temp_max': tuple(air_temp_max),
+            'air_temp_min': tuple(air_temp_min),
+            'day_length': tuple(day_length),
+            'crown_t_mean': crown_t_mean,
+            'tt_base': tt_base}
+
+
+class Phenology:
+
+    def __init__(self, plant_data, env_data):
+        """Phase progression of a Plant without biomass; unlike Plant, it leaves the supplied dicts unchanged"""
+        self.phase_index = [name for name, value in plant_data['phases']]
+        self.thermal_time = [value for name, value in plant_data['phases']]
+        germination = self.phase_index.index('germination')
+        germ_tt = plant_data['shoot_lag'] + env_data['sowing_depth'] * plant_data['shoot_rate']  # Equation 7
+        self.thermal_time[germination] = germ_tt
+
+        eme2ej = plant_data['composite_phases'].get('eme2ej', [])
+        self.eme2ej = [name in eme2ej for name in self.phase_index]
+
+        self.termination = [[] for name in self.phase_index]
+        germ_limit = plant_data.get('days_germ_limit', None)
+        if germ_limit:
+            self.termination[self.phase_index.index('sowing')].append(dict(limit=germ_limit, unit='days'))
+        emerg_limit = plant_data.get('tt_emerg_limit', None)
+        if emerg_limit:
+            self.termination[germination].append(dict(limit=emerg_limit, unit='thermal_time'))
+
+        self.photop_sens = plant_data['photop_sens']
+        self.vern_sens = plant_data['vern_sens']
+        self.pesw_germ = plant_data['pesw_germ']
+        self.final_phase = next(i for i, name in enumerate(self.phase_index) if name.startswith('harvest'))
+
+    def run(self, drivers, soil_water=1e10):
+        """Steps through the season as Plant.step does and returns the phase start days, counted from sowing
+
+        fractional_days also places each transition within its day, for a smooth calibration target.
+        """
+        thermal_time = self.thermal_time
+        eme2ej = self.eme2ej
+        air_temp_max = drivers['air_temp_max']
+        air_temp_min = drivers['air_temp_min']
+        crown_t_mean = drivers['crown_t_mean']
+        tt_base = drivers['tt_base']
+
+        n_phases = len(self.phase_index)
+        phase_days = [None] * n_phases
+        fractional_days = [None] * n_phases
+        phase_days[0] = fractional_days[0] = 0
+        phase = 0
+        phase_day = 0
+        phase_tt = 0
+        remaining_tt = thermal_time[0]
+        vernalisation = 0
+        terminated = False
+        termination_reason = ''
+        for day in range(len(tt_base)):
+            step_tt = tt_base[day]
+            if eme2ej[phase]:
+                photoperiod = photoperiod_factor(drivers['day_length'][day], self.photop_sens)
+                vernalisation = update_vernalisation(vernalisation, air_temp_max[day], air_temp_min[day],
+                                                     crown_t_mean[day])
+                step_tt = step_tt * min(photoperiod, vernalisation_factor(vernalisation, self.vern_sens))
+
+            # Update growth phase progress
+            day_tt = step_tt
+            while step_tt > 0:
+                if phase == 0:
+                    if soil_water >= self.pesw_germ:
+                        remaining_tt = 0
+                    else:
+                        phase_tt += step_tt
+                        break
+                if step_tt >= remaining_tt:
+                    step_tt -= remaining_tt
+                    phase += 1
+                    phase_day = 0
+                    phase_tt = 0
+                    remaining_tt = thermal_time[phase]
+                    phase_days[phase] = day
+                    fractional_days[phase] = day - step_tt / day_tt
+                else:
+                    phase_tt += step_tt
+                    remaining_tt -= step_tt
+                    break
+            phase_day += 1
+
+            # Check termination cases
+            for case in self.termination[phase]:
+                source = phase_day if case['unit'] == 'days' else phase_tt
+                if source >= case['limit']:
+                    terminated = True
+                    termination_reason = f"Killed in {self.phase_index[phase]}: {case['unit']} exceeded {case['limit']}."
+            if terminated or phase >= self.final_phase:
+                break
+
+        return {'phase_days': dict(zip(self.phase_index, phase_days)),
+                'fractional_days': dict(zip(self.phase_index, fractional_days)),
+                'terminated': terminated,
+                'termination_reason': termination_reason}
@@ -1,21 +1,34 @@
 import math
 from utils import interpolate
-from components import BaseComponent, Root, Leaf, Head, Stem
+from phenology import crown_temperature, base_thermal_time, photoperiod_factor, update_vernalisation, \
+    vernalisation_factor
+from components import BaseComponent, FullLog, component_class
 
 class Plant(BaseComponent):
 
-    def __init__(self, plant_data, env_data):
+    def __init__(self, plant_data, env_data, log_policy=None):
         """
 
         Wheat plant data source: https://github.com/APSIMInitiative/APSIMClassic/blob/master/Model/Wheat.xml
+        log_policy sets how much of the daily logs are kept, every day by default (see components/log_policies.py)
+
+        The crop's organs are declared in plant_data: 'organs' nests component names from components/registry.py,
+        'partition_order' is the order biomass flows through the top level organs and 'retranslocation' names
+        the organs that take from the 'sources' to fill their shortfall. The canopy organ must be named 'leaf'.
         """
         super().__init__(self)
+        self.log_policy = log_policy or FullLog()
 
         # Initialize lifetime variables
         self.age = 0
         self.vernalisation = 0
         self.terminated = False
         self.termination_reason = ''
+        self.water_uptake = 0
+        self.water_stress_photo = 1
+        self.water_stress_expansion = 1
+        self.n_concentrations = {}
+        self.organs = {}
 
         # Initialize phase data
         self.phase_index = []
@@ -29,8 +42,14 @@ class Plant(BaseComponent):
             for phase in incl_phases:
                 self.phase_dict[phase]['composite_phases'].append(name)
 
+        # Crop definition
+        self.organ_tree = plant_data.pop('organs')
+        self.partition_order = plant_data.pop('partition_order')
+        self.retranslocation = plant_data.pop('retranslocation')
+
         # Calculate germination time based on sowing depth
         sowing_depth = env_data.pop('sowing_depth')
+        self.sowing_depth = sowing_depth
         shoot_lag = plant_data.pop('shoot_lag')
         shoot_rate = plant_data.pop('shoot_rate')
         germ_tt = shoot_lag + sowing_depth * shoot_rate  # Equation 7
@@ -50,12 +69,14 @@ class Plant(BaseComponent):
         self.phase_modifiers = plant_data.pop('phase_modifiers')
         self.vars = plant_data
         self._set_phase(0)
+        self.day_phase_name = self.phase_name  # Phase the current day started in
 
 
     def step(self, env_conditions):
         """Increments the plant's life by 1 day based on supplied environmental conditions"""
 
         self.age += 1
+        self.day_phase_name = self.phase_name
         env_conditions['air_temp_mean'] = (env_conditions['air_temp_max'] - env_conditions['air_temp_min']) / 2
 
         # Calculate available thermal time
@@ -82,6 +103,8 @@ class Plant(BaseComponent):
         self.log('phase_tt', self.phase_tt)
         self.log('phase_remaining_tt', self.phase_remaining_tt)
         self.log('stage', self.stage)
+        if self.components:
+            self._calc_nitrogen_concentrations()
 
         # Update biomass
         accumulated_biomass = self._calc_biomass_accumulation(env_conditions)
@@ -89,6 +112,10 @@ class Plant(BaseComponent):
         if accumulated_biomass > 0:
             self._calc_biomass_partition(accumulated_biomass, env_conditions, step_tt)
 
+        # Update nitrogen
+        if self.components:
+            self._calc_nitrogen_partition(env_conditions)
+
         # Check termination cases
         for case in self.phase_termination:
             if case['unit'] == 'days':
@@ -137,10 +164,34 @@ class Plant(BaseComponent):
 
 
     def _init_components(self):
-        self.components['root'] = Root(self)
-        self.components['leaf'] = Leaf(self)
-        self.components['head'] = Head(self)
-        self.components['stem'] = Stem(self)
+        def _add_components(parent, organ_tree):
+            for name, sub_organs in organ_tree.items():
+                component = component_class(name)(self, None if parent is self else parent)
+                parent.components[name] = component
+                self.organs[name] = component
+                _add_components(component, sub_organs)
+        _add_components(self, self.organ_tree)
+
+        # Organs start at their critical nitrogen concentration
+        self._calc_nitrogen_concentrations()
+        for organ in self._organs():
+            if organ.n_organ:
+                organ.nitrogen = organ.biomass_total * organ.nitrogen_limits()['crit']
+
+    def _organs(self):
+        """Every component of the plant, including those nested in other components"""
+        return list(self.organs.values())
+
+    def _calc_nitrogen_concentrations(self):
+        """Evaluates the nitrogen concentration curves of each organ for today's stage, shared by all organs"""
+        self.n_concentrations = {}
+        for organ in self._organs():
+            if organ.n_organ:
+                self.n_concentrations[organ.n_organ] = {
+                    limit: interpolate(self.phase_modifiers['x_stage_code'],
+                                       self.phase_modifiers[f'y_n_conc_{limit}_{organ.n_organ}'],
+                                       self.stage)
+                    for limit in ['min', 'crit', 'max']}
 
     def _calc_thermal_time(self, env_conditions):
         """Calculate thermal time in degree-days, the primary growth metric"""
@@ -149,49 +200,42 @@ class Plant(BaseComponent):
         t_max = env_conditions['air_temp_max']
         t_min = env_conditions['air_temp_min']
         snow_height = env_conditions['snow_height']
-        def _sub_zero(temp):
-            return 2 + temp * (0.4 + 0.0018 * (snow_height - 15) ** 2)
-        crown_t_max = t_max if t_max >= 0 else _sub_zero(t_max)  # Equation 1
-        crown_t_min = t_min if t_min >= 0 else _sub_zero(t_min)  # Equation 2
-        crown_t_mean = (crown_t_max + crown_t_min) / 2           # Equation 3
+        crown_t_max = crown_temperature(t_max, snow_height)  # Equation 1
+        crown_t_min = crown_temperature(t_min, snow_height)  # Equation 2
+        crown_t_mean = (crown_t_max + crown_t_min) / 2       # Equation 3
         self.log('crown_t_mean', crown_t_mean)
 
         # 2. Calculate base thermal time
-        if crown_t_mean <= 0:  # Equation 4
-            thermal_time = 0
-        elif crown_t_mean <= 26:
-            thermal_time = crown_t_mean
-        elif crown_t_mean <= 34:
-            thermal_time = 26 / 8 * (34 - crown_t_mean)
+        if 'sub_daily_thermal_time' in env_conditions:
+            # Equation 4 applied to each hour, precomputed for the season (see phenology.sub_daily_thermal_time)
+            thermal_time = env_conditions['sub_daily_thermal_time']
         else:
-            thermal_time = 0
+            thermal_time = base_thermal_time(crown_t_mean)  # Equation 4
         self.log('tt_base', thermal_time)
 
         # 3. Adjust for genetic factors
         if 'eme2ej' in self.phase_composite_phases:
             # Photoperiod penalizes growth based on the amount of available daylight
-            day_length = env_conditions['day_length']
-            photoperiod = 1 - 0.002 * self.vars['photop_sens'] * (20 - day_length) ** 2  # Equation 8
+            photoperiod = photoperiod_factor(env_conditions['day_length'], self.vars['photop_sens'])  # Equation 8
             self.log('photoperiod', photoperiod)
 
             # Vernalization penalizes growth if temperature is too cold or hot
-            if t_max < 30 and t_min < 15:  # Equation 9, 11
-                v0 = 1.4 - 0.0778 * crown_t_mean
-                v1 = 0.5 + 13.44 * (crown_t_mean / ((t_max - t_min + 3) ** 2))
-                self.vernalisation += min(v0, v1)
-            elif t_max > 30 and self.vernalisation < 10:  # Equation 10, 11
-                v0 = 0.5 * (t_max - 30)
-                self.vernalisation -= min(v0, self.vernalisation)
-            vernalisation_factor = 1 - (0.0054545 * self.vars['vern_sens'] + 0.0003) * (50 - self.vernalisation)  # Equation 12
+            self.vernalisation = update_vernalisation(self.vernalisation, t_max, t_min, crown_t_mean)  # Equation 9, 10, 11
+            vern_factor = vernalisation_factor(self.vernalisation, self.vars['vern_sens'])  # Equation 12
             self.log('vernalisation', self.vernalisation)
-            self.log('vernalisation_factor', vernalisation_factor)
+            self.log('vernalisation_factor', vern_factor)
 
             # Thermal time limited by the lowest of these
-            thermal_time = thermal_time * min(photoperiod, vernalisation_factor)  # Equation 6
+            thermal_time = thermal_time * min(photoperiod, vern_factor)  # Equation 6
         self.log('tt_adj_gen', thermal_time)
 
         # 4. Adjust for environmental factors
-        soil_water_stress = 1
+        if 'soil_water_ratio' in env_conditions:
+            soil_water_stress = interpolate(self.vars['x_sw_avail_ratio'],
+                                            self.vars['y_swdef_pheno'],
+                                            env_conditions['soil_water_ratio'])
+        else:
+            soil_water_stress = 1
         nitrogen_stress = 1
         phosphorus_stress = 1
         environmental_factors = min(soil_water_stress, nitrogen_stress, phosphorus_stress)
@@ -204,6 +248,9 @@ class Plant(BaseComponent):
     def _calc_biomass_accumulation(self, env_conditions):
         """Calculates the increase in stored biomass based on current growth and environmental factors"""
 
+        self.water_uptake = 0
+        self.water_stress_photo = 1
+        self.water_stress_expansion = 1
         radiation_use_efficiency = interpolate(self.phase_modifiers['x_stage_rue'],
                                                self.phase_modifiers['y_rue'],
                                                self.stage)
@@ -229,31 +276,20 @@ class Plant(BaseComponent):
                                          air_temp_mean)
         self.log('temperature_factor', temperature_factor)
 
-        # # 1bii. Nitrogen Factor
-        # n_conc_min_leaf = interpolate(self.phase_modifiers['x_stage_code'],
-        #                               self.phase_modifiers['y_n_conc_min_leaf'],
-        #                               self.stage)
-        # n_conc_crit_leaf = interpolate(self.phase_modifiers['x_stage_code'],
-        #                                self.phase_modifiers['y_n_conc_crit_leaf'],
-        #                                self.stage)
-        # leaf_nitrogen = 0
-        # leaves = [
-        #     {'alive': True, 'lai': 1000, 'nitrogen_concentration': 0.05},
-        #     {'alive': False, 'lai': 500, 'nitrogen_concentration': 0.05}
-        # ]
-        # for leaf in leaves:
-        #     leaf_n = (leaf['nitrogen_concentration'] - n_conc_min_leaf) / (n_conc_crit_leaf - n_conc_min_leaf)
-        #     leaf_nitrogen += leaf_n
-        # nitrogen_factor  self.vars['N_fact_photo'] * leaf_nitrogen
-        nitrogen_factor = 1
+        # 1bii. Nitrogen Factor
+        leaf_nitrogen = self.components['leaf'].nitrogen_factor()
+        nitrogen_factor = min(max(self.vars['N_fact_photo'] * leaf_nitrogen, 0), 1)
         self.log('nitrogen_factor', nitrogen_factor)
 
         stress_factor = min(temperature_factor, nitrogen_factor)
 
-        # 1c. CO2 Factor
-        c = env_conditions['co2_concentration']
-        ci = (163 - air_temp_mean) / (5 - 0.1 * air_temp_mean)
-        co2_factor = ((c - ci) * (350 + 2 * ci)) / ((c + 2 * ci) * (350 - ci))
+        # 1c. CO2 Factor, precomputed for the season when running a climate scenario (see scenarios.py)
+        if 'co2_factor' in env_conditions:
+            co2_factor = env_conditions['co2_factor']
+        else:
+            c = env_conditions['co2_concentration']
+            ci = (163 - air_temp_mean) / (5 - 0.1 * air_temp_mean)
+            co2_factor = ((c - ci) * (350 + 2 * ci)) / ((c + 2 * ci) * (350 - ci))
         self.log('co2_factor', co2_factor)
 
         potential_biomass_accumulation = \
@@ -262,36 +298,49 @@ class Plant(BaseComponent):
             stress_factor * \
             co2_factor
         self.log('potential_biomass_accumulation', potential_biomass_accumulation)
+        if potential_biomass_accumulation <= 0:
+            return 0
 
         # 2. Soil Water Deficiency
         # 2a. Transpiration efficiency from co2 concentration
-        transpiration_efficiency_factor = interpolate(self.vars['x_co2_te_modifier'],
-                                                      self.vars['y_co2_te_modifier'],
-                                                      env_conditions['co2_concentration'])
+        if 'transpiration_efficiency_factor' in env_conditions:
+            transpiration_efficiency_factor = env_conditions['transpiration_efficiency_factor']
+        else:
+            transpiration_efficiency_factor = interpolate(self.vars['x_co2_te_modifier'],
+                                                          self.vars['y_co2_te_modifier'],
+                                                          env_conditions['co2_concentration'])
         self.log('transpiration_efficiency_factor', transpiration_efficiency_factor)
-        # 2b. Vapor Pressure Deficit
+        # 2b. Vapor Pressure Deficit (kPa)
         saturated_vapour_pressure = self.vars['svp_fract']
         def f_vpd(t):
-            return 6.1078 * math.exp((17.269 * t) / (237.3 + t))
+            return 6.1078 * math.exp((17.269 * t) / (237.3 + t)) * 0.1  # hPa to kPa
         vapour_pressure_deficit = saturated_vapour_pressure * \
             (f_vpd(env_conditions['air_temp_max']) - f_vpd(env_conditions['air_temp_min']))
         self.log('vapour_pressure_deficit', vapour_pressure_deficit)
-        # 2c. Transpiration efficiency
+        # 2c. Transpiration efficiency (g biomass/m2 per mm of water; 1 mm is 1000 g water/m2)
         transpiration_efficiency_coefficient = interpolate(self.phase_modifiers['x_stage_rue'],
                                                            self.phase_modifiers['transp_eff_cf'],
                                                            self.stage)
         self.log('transpiration_efficiency_coefficient', transpiration_efficiency_coefficient)
-        transpiration_efficiency_modifier = transpiration_efficiency_coefficient / vapour_pressure_deficit
+        transpiration_efficiency_modifier = transpiration_efficiency_coefficient / vapour_pressure_deficit * 1000
         transpiration_efficiency = transpiration_efficiency_factor * transpiration_efficiency_modifier
         self.log('transpiration_efficiency', transpiration_efficiency)
 
-        # 2b. Water demand
+        # 2b. Water demand (mm)
         respiration_rate = 0
         water_demand = (potential_biomass_accumulation - respiration_rate) / transpiration_efficiency
         self.log('water_demand', water_demand)
         water_uptake = min(water_demand, env_conditions['soil_water'])
         water_deficiency_factor = water_uptake / water_demand
         self.log('water_deficiency_factor', water_deficiency_factor)
+        self.water_uptake = water_uptake
+        self.water_stress_photo = water_deficiency_factor
+        if 'soil_water_ratio' in env_conditions:
+            # Canopy expansion is only limited when water comes from a soil water balance
+            self.water_stress_expansion = interpolate(self.vars['x_sw_demand_ratio'],
+                                                      self.vars['y_swdef_leaf'],
+                                                      env_conditions['soil_water'] / water_demand)
+            self.log('water_stress_expansion', self.water_stress_expansion)
 
         # 3. Actual
         actual_biomass_accumulation = potential_biomass_accumulation * water_deficiency_factor
@@ -301,23 +350,55 @@ class Plant(BaseComponent):
 
     def _calc_biomass_partition(self, biomass_accumulation, env_conditions, step_tt):
 
-        # Flow through components
-        remainder = self.components['root'].partition(biomass_accumulation, env_conditions)
-        remainder = self.components['head'].partition(remainder, env_conditions, biomass_accumulation)
-        remainder = self.components['leaf'].partition(remainder, step_tt)
-        self.components['stem'].partition(remainder)
+        # Flow through components, each given the daily inputs it asks for
+        inputs = dict(env_conditions=env_conditions, total_daily_accumulation=biomass_accumulation, step_tt=step_tt)
+        remainder = biomass_accumulation
+        for name in self.partition_order:
+            component = self.components[name]
+            remainder = component.partition(remainder, **{key: inputs[key] for key in component.partition_inputs})
 
         # RE-TRANSLOCATION
-        unfulfilled = self.components['head'].unfulfilled()
+        sink = self.organs[self.retranslocation['sink']]
+        unfulfilled = sink.unfulfilled()
         self.log('unfulfilled', unfulfilled)
         if unfulfilled == 0:
             return
 
-        retranslocated_from_stem = self.components['stem'].retranslocate_from(unfulfilled)
-        unfulfilled -= retranslocated_from_stem
-
-        retranslocated_from_head = self.components['head'].retranslocate_from(unfulfilled)
-        unfulfilled -= retranslocated_from_stem
-
-        retranslocated = retranslocated_from_stem + retranslocated_from_head
-        self.components['head'].retranslocate_to(retranslocated)
+        retranslocated = 0
+        for name in self.retranslocation['sources']:
+            retranslocated_from = self.organs[name].retranslocate_from(unfulfilled)
+            unfulfilled -= retranslocated_from
+            retranslocated += retranslocated_from
+        sink.retranslocate_to(retranslocated)
+
+    def _calc_nitrogen_partition(self, env_conditions):
+        """Takes up soil nitrogen to meet the organs' demand, then retranslocates to the grain what it still lacks"""
+
+        # 1. Uptake, shared between organs by demand
+        organs = self._organs()
+        demands = [organ.nitrogen_demand() for organ in organs]
+        total_demand = sum(demands)
+        uptake = min(total_demand, env_conditions.get('soil_nitrogen', total_demand))
+        self.log('nitrogen_demand', total_demand)
+        self.log('nitrogen_uptake', uptake)
+        if total_demand > 0:
+            for organ, demand in zip(organs, demands):
+                organ.nitrogen += uptake * (demand / total_demand)
+
+        # 2. Retranslocation to the grain from the organs above their minimum concentration
+        grain = self.organs[self.retranslocation['nitrogen_sink']]
+        grain_demand = demands[organs.index(grain)]
+        unfulfilled = grain_demand - uptake * (grain_demand / total_demand) if total_demand > 0 else 0
+        available = [organ.nitrogen_available() for organ in organs]
+        total_available = sum(available)
+        retranslocated = min(unfulfilled, total_available)
+        self.log('nitrogen_retranslocated', retranslocated)
+        if retranslocated > 0:
+            for organ, organ_available in zip(organs, available):
+                organ.nitrogen -= retranslocated * (organ_available / total_available)
+            grain.nitrogen += retranslocated
+
+        for organ in organs:
+            if organ.n_organ or organ is grain:
+                organ.log('nitrogen', organ.nitrogen)
+        self.log('nitrogen_total', self.nitrogen_total())
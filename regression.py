@@ -0,0 +1,151 @@
+import sys
+import gzip
+import json
+import datetime
+import multiprocessing
+import numpy as np
+from sim_runner import sim_runner, batch_runner
+from weather import season_weather
+
+GOLDEN_FILE = 'data_files/golden_logs.json.gz'
+GOLDEN_YEARS = tuple(range(1979, 2014))
+GOLDEN_CO2_LEVELS = (350, 700)
+
+
+def case_key(year, co2_concentration):
+    return f'{year}_{co2_concentration}'
+
+
+def serial_engine(cases):
+    """The reference: one Plant stepped through each (year, co2_concentration) case after another"""
+    return [sim_runner(year, co2_concentration) for year, co2_concentration in cases]
+
+
+def batch_engine(cases):
+    """Runs the cases of each CO2 level together in lockstep with sim_runner.batch_runner"""
+    results = [None] * len(cases)
+    for co2_concentration in sorted(set(co2 for year, co2 in cases)):
+        indices = [i for i, case in enumerate(cases) if case[1] == co2_concentration]
+        seasons = [season_weather(cases[i][0], datetime.date(cases[i][0], 5, 22)) for i in indices]
+        for i, logs in zip(indices, batch_runner(seasons, co2_concentration)):
+            results[i] = logs
+    return results
+
+
+def _run_case(case):
+    return sim_runner(*case)
+
+
+def parallel_engine(cases, processes=None):
+    """Runs the cases in a pool of worker processes"""
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_run_case, cases)
+
+
+def record_golden(fname=GOLDEN_FILE, years=GOLDEN_YEARS, co2_levels=GOLDEN_CO2_LEVELS, engine=serial_engine):
+    """Runs every year at every CO2 level and stores the logs as the golden trajectories"""
+    cases = [(year, co2_concentration) for year in years for co2_concentration in co2_levels]
+    golden = {'years': list(years),
+              'co2_levels': list(co2_levels),
+              'logs': {case_key(*case): logs for case, logs in zip(cases, engine(cases))}}
+    with gzip.open(fname, 'wt') as f:
+        json.dump(golden, f)
+    return golden
+
+
+def load_golden(fname=GOLDEN_FILE):
+    with gzip.open(fname, 'rt') as f:
+        return json.load(f)
+
+
+def golden_cases(golden):
+    return [(year, co2_concentration) for year in golden['years'] for co2_concentration in golden['co2_levels']]
+
+
+def _tolerance(tolerances, component, field):
+    """(rtol, atol) of a field, looked up as 'component.field', then 'field', then '*'"""
+    for key in [f'{component}.{field}', field, '*']:
+        if key in tolerances:
+            return tolerances[key]
+    return (0, 0)
+
+
+def compare_logs(golden_logs, logs, case='', tolerances=None):
+    """Compares one run's logs with its golden logs and returns a divergence, with its differing days, per field
+
+    tolerances maps 'component.field', 'field' or '*' to (rtol, atol) for numpy.isclose; others must match exactly.
+    """
+    tolerances = tolerances or {}
+    divergences = []
+    def _divergence(component, field, reason, days=(), golden=(), actual=()):
+        divergences.append(dict(case=case, component=component, field=field, reason=reason, days=list(days),
+                                golden=list(golden), actual=list(actual)))
+
+    for component in sorted(set(golden_logs) | set(logs)):
+        golden_fields = golden_logs.get(component, {})
+        fields = logs.get(component, {})
+        for field in sorted(set(golden_fields) | set(fields)):
+            if field not in fields:
+                _divergence(component, field, 'missing')
+                continue
+            if field not in golden_fields:
+                _divergence(component, field, 'extra')
+                continue
+            expected = np.asarray(golden_fields[field], dtype=float)
+            values = np.asarray(list(fields[field]), dtype=float)
+            n = min(len(expected), len(values))
+            rtol, atol = _tolerance(tolerances, component, field)
+            differs = ~np.isclose(values[:n], expected[:n], rtol=rtol, atol=atol, equal_nan=True)
+            days = np.flatnonzero(differs)
+            if len(expected) != len(values):
+                _divergence(component, field, f'length {len(values)} != {len(expected)}', days + 1,
+                            expected[days], values[days])
+            elif len(days):
+                _divergence(component, field, 'values', days + 1, expected[days], values[days])
+    return divergences
+
+
+def compare(golden, results, cases=None, tolerances=None):
+    """Compares the logs of an engine's run of cases, all golden cases by default, with the golden logs"""
+    cases = cases or golden_cases(golden)
+    divergences = []
+    for case, logs in zip(cases, results):
+        divergences += compare_logs(golden['logs'][case_key(*case)], logs, case_key(*case), tolerances)
+    return divergences
+
+
+def check_engine(engine, golden=None, cases=None, tolerances=None):
+    """Runs an engine over the golden cases and returns its divergences from the golden logs"""
+    golden = golden or load_golden()
+    cases = cases or golden_cases(golden)
+    return compare(golden, engine(cases), cases, tolerances)
+
+
+def divergence_report(divergences, max_days=5):
+    """Readable report of divergences, one line per field followed by its first max_days diverging days"""
+    if not divergences:
+        return 'No divergences'
+    lines = [f'{len(divergences)} diverging fields in {len(set(d["case"] for d in divergences))} cases']
+    for divergence in divergences:
+        name = f'{divergence["case"]} {divergence["component"]}.{divergence["field"]}'
+        days = divergence['days']
+        if not days:
+            lines.append(f'{name}: {divergence["reason"]}')
+            continue
+        differences = np.abs(np.subtract(divergence['actual'], divergence['golden']))
+        worst = int(np.nanargmax(differences)) if not np.all(np.isnan(differences)) else 0
+        lines.append(f'{name}: {divergence["reason"]}, {len(days)} days from day {days[0]}, '
+                     f'max difference {differences[worst]:.6g} on day {days[worst]}')
+        for day, expected, actual in list(zip(days, divergence['golden'], divergence['actual']))[:max_days]:
+            lines.append(f'    day {day}: golden {expected!r}, actual {actual!r}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # python regression.py [record | serial | batch | parallel]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serial'
+    if command == 'record':
+        record_golden()
+    else:
+        engines = dict(serial=serial_engine, batch=batch_engine, parallel=parallel_engine)
+        print(divergence_report(check_engine(engines[command])))
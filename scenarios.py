@@ -0,0 +1,84 @@
+import datetime
+import functools
+import numpy as np
+from utils import interpolate
+from weather import season_weather, WEATHER_FILE
+
+
+class Scenario:
+
+    def __init__(self, name, temperature_delta=0, radiation_factor=1, co2_concentration=350):
+        """A climate change scenario, applied to the weather of any season and hashed by value for caching
+
+        temperature_delta in degrees C; co2_concentration in ppm, fixed, a {year: ppm} trajectory or daily values.
+        """
+        self.name = name
+        self.temperature_delta = temperature_delta
+        self.radiation_factor = radiation_factor
+        if isinstance(co2_concentration, dict):
+            co2_concentration = tuple(sorted(co2_concentration.items()))
+        elif not isinstance(co2_concentration, (int, float)):
+            co2_concentration = tuple(co2_concentration)
+        self.co2_concentration = co2_concentration
+
+    def _key(self):
+        return self.temperature_delta, self.radiation_factor, self.co2_concentration
+
+    def __eq__(self, other):
+        return isinstance(other, Scenario) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f'Scenario({self.name!r})'
+
+    def co2_series(self, sow_date, n_days):
+        """Daily CO2 concentration of a season of n_days from the sowing date"""
+        co2 = self.co2_concentration
+        if isinstance(co2, (int, float)):
+            return np.full(n_days, float(co2))
+        if isinstance(co2[0], tuple):
+            # Trajectory by year, interpolated to the fraction of the year each day falls at
+            years, values = zip(*co2)
+            year_start = datetime.date(sow_date.year, 1, 1)
+            day_of_year = (sow_date - year_start).days - 1 + np.arange(n_days)
+            return np.interp(sow_date.year + day_of_year / 365, years, values)
+        series = np.asarray(co2[:n_days], dtype=float)
+        return np.concatenate([series, np.full(n_days - len(series), series[-1])])
+
+
+@functools.lru_cache(maxsize=None)
+def scenario_season(scenario, year, sow_date, fname=WEATHER_FILE):
+    """The weather of a season with the scenario's temperature and radiation changes, as {label: tuple of floats}"""
+    season = dict(season_weather(year, sow_date, fname))
+    delta = scenario.temperature_delta
+    season['maxt'] = tuple((np.array(season['maxt']) + delta).tolist())
+    season['mint'] = tuple((np.array(season['mint']) + delta).tolist())
+    season['radn'] = tuple((np.array(season['radn']) * scenario.radiation_factor).tolist())
+    return season
+
+
+@functools.lru_cache(maxsize=None)
+def co2_drivers(scenario, year, sow_date, x_co2_te_modifier, y_co2_te_modifier, fname=WEATHER_FILE):
+    """Cached daily CO2 terms of Plant._calc_biomass_accumulation for a scenario's season, as env_conditions"""
+    season = scenario_season(scenario, year, sow_date, fname)
+    c = scenario.co2_series(sow_date, len(season['maxt']))
+    air_temp_mean = (np.array(season['maxt']) - np.array(season['mint'])) / 2  # As in Plant.step
+    ci = (163 - air_temp_mean) / (5 - 0.1 * air_temp_mean)
+    co2_factor = ((c - ci) * (350 + 2 * ci)) / ((c + 2 * ci) * (350 - ci))
+    te_factors = {value: interpolate(x_co2_te_modifier, y_co2_te_modifier, value) for value in set(c.tolist())}
+    return {'co2_concentration': tuple(c.tolist()),
+            'co2_factor': tuple(co2_factor.tolist()),
+            'transpiration_efficiency_factor': tuple(te_factors[value] for value in c.tolist())}
+
+
+def scenario_grid(temperature_deltas=(0,), radiation_factors=(1,), co2_concentrations=(350,)):
+    """Every combination of the given changes, named after their values (CO2 series by their position)"""
+    co2_names = [f'{co2:g}' if isinstance(co2, (int, float)) else f'series{i}'
+                 for i, co2 in enumerate(co2_concentrations)]
+    return [Scenario(f'T{temperature_delta:+g}_R{radiation_factor:g}_CO2_{co2_name}',
+                     temperature_delta, radiation_factor, co2_concentration)
+            for temperature_delta in temperature_deltas
+            for radiation_factor in radiation_factors
+            for co2_name, co2_concentration in zip(co2_names, co2_concentrations)]
@@ -1,11 +1,28 @@
 import json
+import copy
 import datetime
+import functools
+import multiprocessing
+import numpy as np
 from plant_model import Plant
+from phenology import Phenology, season_drivers, thermal_drivers, sub_daily_thermal_time
+from weather import season_weather, get_env_conditions
+from weather_generator import sample_seasons
+from soil_water import SoilWater
+from scenarios import scenario_season, co2_drivers
+
+WHEAT_FILE = 'data_files/wheat_data.json'
+ENV_FILE = 'data_files/env_data.json'
 
 def _load_file(fname):
     with open(fname) as f:
         return json.load(f)
 
+@functools.lru_cache(maxsize=None)
+def load_data(fname):
+    """Parses a data file once per process; Plant pops from what it is given, so callers pass on copies"""
+    return _load_file(fname)
+
 def default_env_conditions(co2_concentration):
     return {"air_temp_max": 30,
             "air_temp_min": 20,
@@ -16,42 +33,133 @@ def default_env_conditions(co2_concentration):
             "day_length": 16}
 
 
-def sim_runner(year=1979, co2_concentration=350):
+def sim_runner(year=1979, co2_concentration=350, log_policy=None, sub_daily=False, water_balance=False):
 
     # Initialize weather data
-    weather_data = _load_file('data_files/weather_data_colorado.json')
-    labels = weather_data.pop(0)
-    units = weather_data.pop(0)
-    weather_data = [d for d in weather_data if str(d[0]) == str(year)]
-    if len(weather_data) == 0:
-        raise Exception("No data found for given year")
-    ny = datetime.date.fromisoformat(f'{year}-01-01')
     sow_date = datetime.date.fromisoformat(f'{year}-05-22')
-    sow_julian = sow_date - ny
-    def get_weather_data(step_day):
-        step_julian = sow_julian + datetime.timedelta(days=(step_day))
-        step_data = weather_data[step_julian.days - 1]
-        step_dict = {key: value for (key, value) in zip(labels, step_data)}
-        return step_dict
-    def get_env_conditions(step_day, co2_concentration):
-        weather_data = get_weather_data(step_day)
-        return {'air_temp_max': float(weather_data['maxt']),
-                'air_temp_min': float(weather_data['mint']),
-                'snow_height': float(weather_data['snow']),
-                'soil_water': 1e10,
-                'total_radiation': float(weather_data['radn']),
-                'co2_concentration': co2_concentration,
-                'day_length': float(weather_data['dayL'])}
-
-    wheat_data = _load_file('data_files/wheat_data.json')
-    env_data = _load_file('data_files/env_data.json')
-    wheat_plant = Plant(wheat_data, env_data)
+    season = season_weather(year, sow_date)
+    thermal_time = season_drivers(year, sow_date, sub_daily=True)['tt_base'] if sub_daily else None
+    soil_data = _load_file('data_files/soil_data.json') if water_balance else None
+    return season_runner(season, co2_concentration, log_policy, thermal_time, soil_data)
+
+
+def season_runner(season, co2_concentration=350, log_policy=None, sub_daily_thermal_time=None, soil_data=None,
+                  plant_data=None, env_data=None):
+    """Runs a plant through a season of weather, given as {label: daily values} from the sowing date
+
+    sub_daily_thermal_time is the season's base thermal time, if used; soil_data switches on the soil water balance.
+    """
+    thermal_times = [sub_daily_thermal_time] if sub_daily_thermal_time is not None else None
+    return batch_runner([season], co2_concentration, log_policy, thermal_times, soil_data, plant_data, env_data)[0]
+
+
+def batch_runner(seasons, co2_concentration=350, log_policy=None, sub_daily_thermal_times=None, soil_data=None,
+                 plant_data=None, env_data=None, daily_drivers=None):
+    """Runs one plant per season in lockstep and returns their logs
+
+    soil_data gives every plant its own soil water profile; daily_drivers sets {env_conditions key: daily values}.
+    """
+    plant_data = plant_data or load_data(WHEAT_FILE)
+    env_data = env_data or load_data(ENV_FILE)
+    plants = [Plant(copy.deepcopy(plant_data), dict(env_data), log_policy) for season in seasons]
+    soil = SoilWater(soil_data, len(seasons)) if soil_data else None
+    active = list(range(len(seasons)))
     day = 0
-    while True:
-        env_conditions = get_env_conditions(day, co2_concentration)
-        wheat_plant.step(env_conditions)
-        if wheat_plant.phase_name.startswith('harvest'):
-            break
+    while active:
+        for i in active:
+            if day == len(seasons[i]['maxt']):
+                raise ValueError(f"Weather of season {i} ends after {day} days, before harvest")
+        env_conditions = {i: get_env_conditions(seasons[i], day, co2_concentration) for i in active}
+        if sub_daily_thermal_times is not None:
+            for i in active:
+                env_conditions[i]['sub_daily_thermal_time'] = sub_daily_thermal_times[i][day]
+        if daily_drivers is not None:
+            for i in active:
+                env_conditions[i].update({key: values[day] for key, values in daily_drivers[i].items()})
+        if soil is not None:
+            root_depth = _soil_water_balance(soil, plants, seasons, active, day)
+            conditions = soil.conditions(root_depth)
+            for i in active:
+                env_conditions[i].update({key: float(values[i]) for key, values in conditions.items()})
+
+        for i in active:
+            plants[i].step(env_conditions[i])
+
+        if soil is not None:
+            uptake = np.zeros(len(plants))
+            uptake[active] = [plants[i].water_uptake for i in active]
+            soil.extract(uptake, root_depth)
+        active = [i for i in active if not plants[i].phase_name.startswith('harvest')]
         day += 1
-    logs = wheat_plant.get_logs()
-    return logs
+    return [plant.get_logs() for plant in plants]
+
+
+def scenario_runner(scenarios, years, sow_date='05-22', log_policy=None, soil_data=None, processes=1):
+    """Runs every year under every climate scenario (see scenarios.py) and returns {(scenario name, year): logs}"""
+    names = [scenario.name for scenario in scenarios]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ValueError(f"Scenario names must be unique, as they key the results: {', '.join(duplicates)}")
+    cases = [(scenario, year) for scenario in scenarios for year in years]
+    if processes > 1:
+        chunks = [(cases[i::processes], sow_date, log_policy, soil_data) for i in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(_scenario_batch, chunks)
+        logs = {}
+        for result in results:
+            logs.update(result)
+        return {(scenario.name, year): logs[(scenario.name, year)] for scenario, year in cases}
+    return _scenario_batch(cases, sow_date, log_policy, soil_data)
+
+
+def _scenario_batch(cases, sow_date, log_policy, soil_data):
+    plant_data = load_data(WHEAT_FILE)
+    x_co2_te_modifier = tuple(plant_data['x_co2_te_modifier'])
+    y_co2_te_modifier = tuple(plant_data['y_co2_te_modifier'])
+    seasons = []
+    daily_drivers = []
+    for scenario, year in cases:
+        year_sow_date = datetime.date.fromisoformat(f'{year}-{sow_date}')
+        seasons.append(scenario_season(scenario, year, year_sow_date))
+        daily_drivers.append(co2_drivers(scenario, year, year_sow_date, x_co2_te_modifier, y_co2_te_modifier))
+    logs = batch_runner(seasons, log_policy=log_policy, soil_data=soil_data, daily_drivers=daily_drivers)
+    return {(scenario.name, year): plant_logs for (scenario, year), plant_logs in zip(cases, logs)}
+
+
+def _soil_water_balance(soil, plants, seasons, active, day):
+    """Adds the day's rain and removes soil evaporation, returning the root depth of each plant"""
+    weather = np.zeros((4, len(plants)))
+    weather[:, active] = [[seasons[i][label][day] for i in active] for label in ['rain', 'radn', 'maxt', 'mint']]
+    rain, radn, air_temp_max, air_temp_min = weather
+    root_depth = [plant.components['root'].root_depth if 'root' in plant.components else plant.sowing_depth
+                  for plant in plants]
+    lai = [plant.components['leaf'].lai if 'leaf' in plant.components else 0 for plant in plants]
+    soil.infiltrate(rain)
+    soil.evaporate(radn, air_temp_max, air_temp_min, lai)
+    return root_depth
+
+
+def phenology_runner(year=1979, sow_date=None, sub_daily=False):
+    """Returns the phase start days of a season without simulating biomass"""
+    if sow_date is None:
+        sow_date = datetime.date.fromisoformat(f'{year}-05-22')
+    phenology = Phenology(load_data(WHEAT_FILE), load_data(ENV_FILE))
+    return phenology.run(season_drivers(year, sow_date, sub_daily=sub_daily))
+
+
+def ensemble_runner(sample, sow_date, co2_concentration=350, phenology_only=False, log_policy=None,
+                    sub_daily=False, soil_data=None):
+    """Runs every synthetic year of a WeatherGenerator sample from the sowing date (the year of sow_date is ignored)
+
+    The phenology-only path assumes water isn't limiting, so soil_data only applies to full runs.
+    """
+    seasons = sample_seasons(sample, sow_date)
+    if not phenology_only:
+        thermal_times = None
+        if sub_daily:
+            start = len(sample['maxt'][0]) - len(seasons[0]['maxt'])
+            thermal_times = sub_daily_thermal_time(sample['maxt'], sample['mint'], sample['snow'])[:, start:].tolist()
+        return batch_runner(seasons, co2_concentration, log_policy, thermal_times, soil_data)
+    phenology = Phenology(load_data(WHEAT_FILE), load_data(ENV_FILE))
+    return [phenology.run(thermal_drivers(season['maxt'], season['mint'], season['snow'], season['dayL'], sub_daily))
+            for season in seasons]
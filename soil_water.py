@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def potential_evaporation(radn, air_temp_max, air_temp_min, albedo):
+    """Priestley-Taylor potential evapotranspiration in mm, as in the APSIM SoilWat module"""
+    wt_ave_temp = 0.6 * np.asarray(air_temp_max) + 0.4 * np.asarray(air_temp_min)
+    eeq = np.asarray(radn) * 23.8846 * (0.000204 - 0.000183 * albedo) * (wt_ave_temp + 29)
+    return np.maximum(eeq * 1.1, 0)
+
+
+class SoilWater:
+
+    def __init__(self, soil_data, n=1):
+        """Layered tipping-bucket soil water balance of n plants in mm; layer limits in soil_data are in mm/mm"""
+        self.thickness = np.array(soil_data['thickness'], dtype=float)
+        self.depth_bottom = np.cumsum(self.thickness)
+        self.depth_top = self.depth_bottom - self.thickness
+        self.depth = self.depth_bottom[-1]
+        self.ll = np.array(soil_data['ll']) * self.thickness
+        self.dul = np.array(soil_data['dul']) * self.thickness
+        self.sat = np.array(soil_data['sat']) * self.thickness
+        self.kl = np.array(soil_data['kl'], dtype=float)
+        self.swcon = soil_data['swcon']
+        self.albedo = soil_data['albedo']
+        self.extinction_coefficient = soil_data['extinction_coefficient']
+        initial_sw = self.ll + soil_data['initial_fraction'] * (self.dul - self.ll)
+        self.sw = np.tile(initial_sw, (n, 1))
+
+    def infiltrate(self, rain):
+        """Cascades rain down through the layers and returns the drainage out of the bottom (n,)"""
+        water = np.asarray(rain, dtype=float)
+        for layer in range(len(self.thickness)):
+            self.sw[:, layer] += water
+            water = np.maximum(self.sw[:, layer] - self.sat[layer], 0)
+            self.sw[:, layer] -= water
+        drainage = np.zeros(len(self.sw))
+        for layer in range(len(self.thickness)):
+            self.sw[:, layer] += drainage
+            drainage = self.swcon * np.maximum(self.sw[:, layer] - self.dul[layer], 0)
+            self.sw[:, layer] -= drainage
+        return drainage + water
+
+    def evaporate(self, radn, air_temp_max, air_temp_min, lai):
+        """Evaporates from the top layer, down to its lower limit, what the canopy leaves uncovered"""
+        eo = potential_evaporation(radn, air_temp_max, air_temp_min, self.albedo)
+        cover = 1 - np.exp(-self.extinction_coefficient * np.asarray(lai, dtype=float))
+        evaporation = np.minimum(eo * (1 - cover), np.maximum(self.sw[:, 0] - self.ll[0], 0))
+        self.sw[:, 0] -= evaporation
+        return evaporation
+
+    def _root_fraction(self, root_depth):
+        """Share of each layer explored by roots, (n, layers)"""
+        root_depth = np.asarray(root_depth, dtype=float)[:, None]
+        return np.clip((root_depth - self.depth_top) / self.thickness, 0, 1)
+
+    def _supply(self, root_fraction):
+        return self.kl * np.maximum(self.sw - self.ll, 0) * root_fraction
+
+    def conditions(self, root_depth):
+        """Soil entries of each plant's env_conditions: potential uptake (mm) and extractable water ratios"""
+        root_fraction = self._root_fraction(root_depth)
+        extractable = np.maximum(self.sw - self.ll, 0)
+        capacity = self.dul - self.ll
+        explored = root_fraction > 0
+        soil_water_ratio = (extractable * root_fraction).sum(axis=1) / (capacity * root_fraction).sum(axis=1)
+        front = np.minimum(explored.sum(axis=1), len(self.thickness)) - 1
+        front = np.maximum(front, 0)
+        rows = np.arange(len(self.sw))
+        return {'soil_water': self._supply(root_fraction).sum(axis=1),
+                'soil_water_ratio': soil_water_ratio,
+                'root_front_water_ratio': extractable[rows, front] / capacity[front],
+                'soil_depth': np.full(len(self.sw), self.depth)}
+
+    def extract(self, uptake, root_depth):
+        """Removes each plant's water uptake from the layers in proportion to their supply"""
+        supply = self._supply(self._root_fraction(root_depth))
+        total = supply.sum(axis=1)
+        share = np.divide(np.asarray(uptake, dtype=float), total, out=np.zeros(len(total)), where=total > 0)
+        self.sw -= supply * np.minimum(share, 1)[:, None]
@@ -0,0 +1,75 @@
+import csv
+import json
+
+from batch_driver import main, run_batch
+from sim_runner import sim_runner
+
+def _write_jobs(path, jobs):
+    with open(path, 'w') as f:
+        for job in jobs:
+            f.write(json.dumps(job) + '\n')
+
+def _read_jsonl(path):
+    with open(path) as f:
+        return {result['id']: result for result in map(json.loads, f)}
+
+def test_batch_driver(tmp_path):
+    jobs_file = str(tmp_path / 'jobs.jsonl')
+    output = str(tmp_path / 'results.jsonl')
+    _write_jobs(jobs_file, [{'id': 'base', 'year': 1985, 'co2': 350},
+                            {'id': 'late', 'year': 1985, 'co2': 350, 'overrides': {'flowering': 400}},
+                            {'year': 1995, 'co2': 700, 'sowing_date': '1995-05-01'},
+                            {'id': 'missing', 'year': 1900}])
+    bad_jobs_file = str(tmp_path / 'bad_jobs.jsonl')
+    _write_jobs(bad_jobs_file, [{'id': 'new_year', 'year': 1985, 'sowing_date': '01-01'},
+                                {'id': 'other_year', 'year': 1985, 'sowing_date': '1984-05-22'},
+                                {'id': 'late', 'year': 1985, 'sowing_date': '11-15'}])
+    main([jobs_file, output, '--workers', '2'])
+    results = _read_jsonl(output)
+    assert set(results) == {'base', 'late', '3', 'missing'}
+    assert results['base']['status'] == 'ok'
+    assert results['base']['biomass_total'] == sim_runner(1985)['plant']['biomass_total'][-1]
+    assert results['late']['maturity_day'] > results['base']['maturity_day']
+    assert results['3']['sowing_date'] == '1995-05-01'
+    assert results['missing']['status'] == 'error'
+    assert results['missing']['error'] == 'No data found for given year'
+
+    # Sowing dates that can't give a season are reported against their job
+    bad_output = str(tmp_path / 'bad_results.jsonl')
+    run_batch(bad_jobs_file, bad_output)
+    errors = {job_id: result['error'] for job_id, result in _read_jsonl(bad_output).items()}
+    assert errors['new_year'] == 'Job new_year: sowing date 1985-01-01 must be in 1985, after January 1'
+    assert errors['other_year'] == 'Job other_year: sowing date 1984-05-22 must be in 1985, after January 1'
+    assert errors['late'] == 'Job late: the weather of 1985 ends before harvest when sown on 1985-11-15'
+
+    # Resuming after an interruption only runs the jobs missing from the output
+    with open(output) as f:
+        lines = f.readlines()
+    with open(output, 'w') as f:
+        f.writelines(lines[:2] + [lines[2][:20]])
+    assert run_batch(jobs_file, output) == 2
+    with open(output) as f:
+        ids = [json.loads(line)['id'] for line in f]
+    assert sorted(ids) == ['3', 'base', 'late', 'missing']
+    assert run_batch(jobs_file, output) == 0
+
+    # CSV results, one row per job
+    csv_output = str(tmp_path / 'results.csv')
+    run_batch(jobs_file, csv_output)
+    with open(csv_output, newline='') as f:
+        rows = {row['id']: row for row in csv.DictReader(f)}
+    assert set(rows) == {'base', 'late', '3', 'missing'}
+    assert float(rows['base']['biomass_total']) == results['base']['biomass_total']
+
+    # A row cut after its status is run again, and the rows written after it are whole
+    with open(csv_output, newline='') as f:
+        lines = f.read().splitlines(keepends=True)
+    cut_id = lines[-1].split(',')[0]
+    with open(csv_output, 'w', newline='') as f:
+        f.writelines(lines[:-1] + [','.join(lines[-1].split(',')[:6])])
+    assert run_batch(jobs_file, csv_output) == 1
+    with open(csv_output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(row['id'] for row in rows) == ['3', 'base', 'late', 'missing']
+    assert all(None not in row.values() for row in rows)
+    assert next(row for row in rows if row['id'] == cut_id)['status'] in ('ok', 'error')
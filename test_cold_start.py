@@ -0,0 +1,55 @@
+import os
+import shutil
+import datetime
+import pytest
+
+import cold_start
+from regression import load_golden, compare_logs
+from weather import season_weather
+
+def test_artifact(tmp_path):
+    fname = str(tmp_path / 'static_inputs.pickle')
+    # Built on first load, then only the header is read until a year is needed
+    artifact = cold_start.load_artifact(fname)
+    assert artifact['weather'] == {}
+    assert isinstance(artifact['plant_data']['y_leaf_size'], tuple)
+    assert isinstance(artifact['plant_data']['phase_modifiers']['y_rue'], tuple)
+    sow_date = datetime.date(1985, 5, 22)
+    assert cold_start.season_weather(artifact, 1985, sow_date) == season_weather(1985, sow_date)
+    assert list(artifact['weather']) == [('colorado', 1985)]
+    with pytest.raises(Exception, match='No data found for given year'):
+        cold_start.year_weather(artifact, 1900)
+
+    golden = load_golden()
+    for year, co2_concentration in [(1985, 350), (2005, 700)]:
+        logs = cold_start.run_season(year, co2_concentration, fname=fname)
+        assert compare_logs(golden['logs'][f'{year}_{co2_concentration}'], logs) == []
+
+def test_artifact_staleness(tmp_path, monkeypatch):
+    fname = str(tmp_path / 'static_inputs.pickle')
+    wheat_file = str(tmp_path / 'wheat_data.json')
+    shutil.copy(cold_start.WHEAT_FILE, wheat_file)
+    monkeypatch.setattr(cold_start, 'WHEAT_FILE', wheat_file)
+    cold_start.load_artifact(fname)
+    built = os.stat(fname)
+    # Written through a temporary file that is moved into place
+    assert sorted(os.listdir(tmp_path)) == ['static_inputs.pickle', 'wheat_data.json']
+
+    # A source with a new modification time but the same content, as after a checkout, doesn't rebuild it
+    cold_start._artifacts.clear()
+    os.utime(wheat_file, (0, 0))
+    cold_start.load_artifact(fname)
+    assert os.stat(fname).st_ino == built.st_ino
+
+    # A changed source does
+    cold_start._artifacts.clear()
+    with open(wheat_file, 'a') as f:
+        f.write('\n')
+    cold_start.load_artifact(fname)
+    assert os.stat(fname).st_ino != built.st_ino
+    assert sorted(os.listdir(tmp_path)) == ['static_inputs.pickle', 'wheat_data.json']
+
+def test_cold_start_report():
+    report = cold_start.cold_start_report(repeats=1).splitlines()
+    assert report[1].split() == ['path', 'import', 'load', 'run', 'total', 'process', 'modules']
+    assert [line.split()[0] for line in report[2:]] == ['json', 'artifact']
@@ -0,0 +1,93 @@
+import json
+import datetime
+import pytest
+
+from plant_model import Plant
+from phenology import Phenology, season_drivers, year_drivers, base_thermal_time, sub_daily_thermal_time
+from calibration import Calibration
+from weather import season_weather, get_env_conditions
+
+def _load_file(fname):
+    with open(fname) as f:
+        return json.load(f)
+
+def _plant_phase_days(year, sow_date):
+    wheat = Plant(_load_file('data_files/wheat_data.json'), _load_file('data_files/env_data.json'))
+    season = season_weather(year, sow_date)
+    phase_days = {'sowing': 0}
+    day = 0
+    while not wheat.phase_name.startswith('harvest'):
+        previous = wheat.phase_number
+        wheat.step(get_env_conditions(season, day, 350))
+        for i in range(previous + 1, wheat.phase_number + 1):
+            phase_days[wheat.phase_index[i]] = day
+        day += 1
+    return phase_days
+
+@pytest.mark.parametrize('year', [1979, 1980, 1985, 1995, 2005])
+def test_phenology_matches_plant(year):
+    sow_date = datetime.date(year, 5, 22)
+    phenology = Phenology(_load_file('data_files/wheat_data.json'), _load_file('data_files/env_data.json'))
+    result = phenology.run(season_drivers(year, sow_date))
+    phase_days = {name: day for name, day in result['phase_days'].items() if day is not None}
+    assert phase_days == _plant_phase_days(year, sow_date)
+    assert not result['terminated']
+
+def test_phenology_termination():
+    wheat_data = _load_file('data_files/wheat_data.json')
+    wheat_data['shoot_lag'] = 400
+    phenology = Phenology(wheat_data, _load_file('data_files/env_data.json'))
+    drivers = season_drivers(1980, datetime.date(1980, 5, 22))
+    result = phenology.run(drivers)
+    assert result['terminated']
+    assert result['termination_reason'] == 'Killed in germination: thermal_time exceeded 300.'
+    assert result['phase_days']['emergence'] is None
+
+def test_calibration():
+    wheat_data = _load_file('data_files/wheat_data.json')
+    env_data = _load_file('data_files/env_data.json')
+
+    # Observations from a cultivar with different thermal times
+    cultivar = _load_file('data_files/wheat_data.json')
+    cultivar['shoot_lag'] = 55
+    cultivar['phases'] = [[name, {'end_of_juvenile': 330, 'flowering': 100}.get(name, value)]
+                          for name, value in cultivar['phases']]
+    phenology = Phenology(cultivar, env_data)
+    observations = []
+    for year in range(1980, 1986):
+        sow_date = datetime.date(year, 5, 22)
+        phase_days = phenology.run(season_drivers(year, sow_date))['phase_days']
+        observations.append(dict(year=year, sow_date=sow_date,
+                                 phases={name: phase_days[name] for name in ['emergence', 'flowering', 'maturity']}))
+
+    calibration = Calibration(wheat_data, env_data, observations)
+    initial_error = calibration.objective(calibration.x0)
+    fitted, error = calibration.fit()
+    assert error < initial_error
+    assert error < 0.25
+    calibrated = calibration.calibrated_plant_data(fitted)
+    assert calibrated['shoot_lag'] == fitted['shoot_lag']
+    assert dict(calibrated['phases'])['flowering'] == fitted['flowering']
+    assert wheat_data['shoot_lag'] == 40
+
+def test_sub_daily_thermal_time():
+    # Within 0-26 oC the response is linear, so hourly and daily thermal time agree
+    assert sub_daily_thermal_time([20, 12], [5, 1], [0, 0]) == pytest.approx([12.5, 6.5])
+    # Hot afternoons lose thermal time that the daily mean hides
+    assert base_thermal_time((35 + 15) / 2) == 25
+    assert sub_daily_thermal_time(35, 15, 0) < 20
+    # Frost and snow insulation
+    assert sub_daily_thermal_time(-10, -20, 0) == 0
+    assert sub_daily_thermal_time(-2, -10, 15) > sub_daily_thermal_time(-2, -10, 0)
+
+    sow_date = datetime.date(1985, 5, 22)
+    daily = season_drivers(1985, sow_date)
+    hourly = season_drivers(1985, sow_date, sub_daily=True)
+    # Computed once per site-year and sliced for each sowing date
+    assert year_drivers(1985, sub_daily=True) is year_drivers(1985, sub_daily=True)
+    later = season_drivers(1985, datetime.date(1985, 6, 1), sub_daily=True)
+    assert later['tt_base'] == hourly['tt_base'][10:]
+    season = season_weather(1985, datetime.date(1985, 6, 1))
+    assert later['air_temp_max'] == season['maxt'] and later['day_length'] == season['dayL']
+    assert hourly['crown_t_mean'] == daily['crown_t_mean']
+    assert sum(hourly['tt_base']) < sum(daily['tt_base'])
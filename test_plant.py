@@ -1,7 +1,12 @@
 import json
+import subprocess
+import sys
 import pytest
 
 from plant_model import Plant
+import components
+from components import BaseComponent, EveryNthDay, RingBuffer, PhaseAggregates, register_component
+from components.leaf_cohorts import LeafCohorts
 
 def _load_file(fname):
     with open(fname) as f:
@@ -85,8 +90,8 @@ def test_wheat_model():
     assert _log('nitrogen_factor') == 1
     assert _log('co2_factor') == 1.152005916126045
     assert _log('potential_biomass_accumulation') == 14.284873359962958
-    assert _log('water_deficiency_factor') == 0.040287454882394706
-    assert _log('actual_biomass_accumulation') == 0.5755011909902298
+    assert _log('water_deficiency_factor') == 1
+    assert _log('actual_biomass_accumulation') == 14.284873359962958
     # Biomass partition
     # assert _log('biomass_root', 'root') == 1
     # assert _log('biomass_head', 'head') == 1
@@ -106,3 +111,154 @@ def test_wheat_model():
     _step(1)
     assert wheat.phase_name == 'harvest_rips'
     assert wheat.phase_day == 1
+
+def test_log_policies():
+    env_conditions = _load_file('data_files/default_env_conditions.json')
+    def _run(log_policy, n_steps=60):
+        wheat = Plant(_load_file('data_files/wheat_data.json'), _load_file('data_files/env_data.json'), log_policy)
+        for i in range(n_steps):
+            wheat.step(dict(env_conditions))
+        return wheat.get_logs()
+
+    full = _run(None)
+    assert len(full['plant']['stage']) == 60
+
+    every_nth = _run(EveryNthDay(7))
+    assert list(every_nth['plant']['stage']) == full['plant']['stage'][::7]
+    assert list(every_nth['leaf']['lai']) == full['leaf']['lai'][::7]
+
+    ring = _run(RingBuffer(5))
+    assert list(ring['plant']['stage']) == full['plant']['stage'][-5:]
+    assert list(ring['leaf']['lai']) == full['leaf']['lai'][-5:]
+
+    aggregates = _run(PhaseAggregates())
+    stage = aggregates['plant']['stage']
+    assert set(stage) == {'sowing', 'germination', 'emergence', 'end_of_juvenile', 'floral_initiation',
+                          'flowering', 'start_of_grain_filling'}
+    assert sum(phase['count'] for phase in stage.values()) == 60
+    # Every field logged daily counts the same days in each phase, whatever its place in the day
+    for field in ['crown_t_mean', 'tt_base', 'phase_day', 'biomass_total']:
+        assert {name: phase['count'] for name, phase in aggregates['plant'][field].items()} == \
+               {name: phase['count'] for name, phase in stage.items()}
+    flowering = stage['flowering']
+    assert flowering['min'] <= flowering['mean'] <= flowering['max']
+    assert flowering['sum'] == pytest.approx(flowering['mean'] * flowering['count'])
+
+    # Daily caches keep only today's entry, so memory stays bounded with any policy
+    wheat = Plant(_load_file('data_files/wheat_data.json'), _load_file('data_files/env_data.json'), RingBuffer(5))
+    for i in range(80):
+        wheat.step(dict(env_conditions))
+    head = wheat.components['head']
+    assert list(head.components['grain'].demand_cache) == [80]
+    assert list(head.components['pod'].demand_cache) == [80]
+
+def test_nitrogen_pools():
+    env_conditions = _load_file('data_files/default_env_conditions.json')
+    def _run(soil_nitrogen, n_steps=80):
+        wheat = Plant(_load_file('data_files/wheat_data.json'), _load_file('data_files/env_data.json'))
+        for i in range(n_steps):
+            conditions = dict(env_conditions)
+            if soil_nitrogen is not None:
+                conditions['soil_nitrogen'] = soil_nitrogen
+            wheat.step(conditions)
+        return wheat
+
+    # Concentration curves are evaluated once per day for every organ with nitrogen
+    wheat = _run(None)
+    assert set(wheat.n_concentrations) == {'leaf', 'stem', 'pod'}
+    limits = wheat.n_concentrations['leaf']
+    assert limits['min'] < limits['crit'] < limits['max']
+    leaf = wheat.components['leaf']
+    assert leaf.nitrogen >= leaf.biomass_total * limits['crit']
+    assert wheat.logs['nitrogen_factor'][-1] == 1
+    assert wheat.components['head'].components['grain'].nitrogen > 0
+    assert sum(wheat.logs['nitrogen_retranslocated']) == 0
+
+    # Without soil nitrogen the plant only has what it emerged with, and photosynthesis suffers
+    starved = _run(0)
+    assert starved.nitrogen_total() == pytest.approx(starved.logs['nitrogen_total'][3])
+    assert min(starved.logs['nitrogen_factor'][5:]) < 1
+    assert starved.biomass() < wheat.biomass()
+
+    # With little soil nitrogen, the grain draws on the other organs
+    limited = _run(0.01)
+    assert sum(limited.logs['nitrogen_retranslocated']) > 0
+    assert starved.biomass() < limited.biomass() < wheat.biomass()
+
+def test_leaf_cohorts():
+    # Area fills the expanding leaves and senesces from the oldest leaf up
+    cohorts = LeafCohorts(2, 200, 2, size=4)
+    assert list(cohorts.area[:2]) == [100, 100]
+    cohorts.expand(1.5, 400, 50)
+    assert cohorts.appeared == 3.5
+    assert list(cohorts.age()) == [50, 50, 0, 0]
+    assert cohorts.area.sum() == pytest.approx(600)
+    assert len(cohorts.area) >= 6
+    cohorts.add_nitrogen(6)
+    assert cohorts.nitrogen.sum() == pytest.approx(6)
+    assert cohorts.senesce(1, 150, 1) == pytest.approx(1)
+    assert cohorts.area[0] == 0 and cohorts.area[1] == 50
+    assert cohorts.oldest == 1
+    assert cohorts.nitrogen[0] == 0
+    assert cohorts.nitrogen.sum() == pytest.approx(cohorts.nitrogen_total) == pytest.approx(5)
+    # The next leaves to senesce are the oldest green ones, with the area they grew to
+    assert cohorts.senescing_area(0.5) == pytest.approx(50)
+    assert cohorts.senescing_area(10) == pytest.approx(100)
+
+    # Leaves are weighted by area, so new leaves without nitrogen limit the factor of well-fed old ones
+    cohorts = LeafCohorts(2, 200, 2, size=4)
+    cohorts.add_nitrogen(2)
+    assert cohorts.nitrogen_factor(100, 0.01, 0.02) == pytest.approx(1)
+    cohorts.expand(0, 200, 0)
+    assert cohorts.nitrogen_factor(200, 0.01, 0.02) == pytest.approx(0.5)
+
+    # Through a season the cohorts add up to the leaf without outgrowing their arrays
+    env_conditions = _load_file('data_files/default_env_conditions.json')
+    wheat = Plant(_load_file('data_files/wheat_data.json'), _load_file('data_files/env_data.json'))
+    for i in range(100):
+        wheat.step(dict(env_conditions))
+        if wheat.components:
+            leaf = wheat.components['leaf']
+            assert leaf.cohorts.area.sum() == pytest.approx(leaf.lai)
+    assert len(leaf.cohorts.area) == 32
+    assert leaf.cohorts.senesced_area.sum() == pytest.approx(sum(leaf.logs['lai_senescence']))
+    assert not leaf.cohorts.area[:leaf.cohorts.oldest].any()
+    assert leaf.cohorts.green_leaves() >= 0
+
+class Tuber(BaseComponent):
+
+    partition_inputs = ('total_daily_accumulation',)
+
+    def partition(self, available_biomass, total_daily_accumulation):
+        biomass_tuber = min(available_biomass, total_daily_accumulation / 2)
+        self.biomass_total += biomass_tuber
+        self.unfulfilled_total = total_daily_accumulation / 2 - biomass_tuber
+        self.log('biomass_tuber', biomass_tuber)
+        return available_biomass - biomass_tuber
+
+    def retranslocate_to(self, amount):
+        self.biomass_total += amount
+        self.unfulfilled_total -= amount
+
+def test_crop_definition():
+    # Only the organs a crop uses are imported
+    script = 'import sys, plant_model; print(sorted(m for m in sys.modules if m.startswith("components.")))'
+    modules = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    assert 'components.leaf' not in modules and 'components.grain' not in modules
+
+    # A new crop only needs its organs registered and declared in its data
+    register_component('tuber', __name__, 'Tuber')
+    assert components.Tuber is Tuber and components.Leaf.__name__ == 'Leaf'
+    with pytest.raises(AttributeError):
+        components.Cob
+    crop_data = _load_file('data_files/wheat_data.json')
+    crop_data['organs'] = {'root': {}, 'leaf': {}, 'tuber': {}, 'stem': {}}
+    crop_data['partition_order'] = ['root', 'tuber', 'leaf', 'stem']
+    crop_data['retranslocation'] = {'sink': 'tuber', 'sources': ['stem'], 'nitrogen_sink': 'tuber'}
+    crop = Plant(crop_data, _load_file('data_files/env_data.json'))
+    env_conditions = _load_file('data_files/default_env_conditions.json')
+    for i in range(60):
+        crop.step(dict(env_conditions))
+    assert list(crop.components) == ['root', 'leaf', 'tuber', 'stem']
+    assert crop.components['tuber'].biomass() > 0
+    assert 'tuber' in crop.get_logs() and 'grain' not in crop.get_logs()
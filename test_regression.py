@@ -0,0 +1,38 @@
+import copy
+import pytest
+
+from regression import load_golden, golden_cases, check_engine, compare_logs, divergence_report, \
+    serial_engine, batch_engine, parallel_engine
+
+@pytest.fixture(scope='module')
+def golden():
+    return load_golden()
+
+def test_engines_match_golden(golden):
+    assert len(golden_cases(golden)) == 70
+    assert check_engine(serial_engine, golden) == []
+    assert check_engine(batch_engine, golden) == []
+    assert check_engine(parallel_engine, golden, cases=[(1985, 350), (1995, 700)]) == []
+
+def test_divergence_report(golden):
+    expected = golden['logs']['1985_350']
+    logs = copy.deepcopy(expected)
+    logs['leaf']['lai'][40] += 1e-6
+    logs['plant']['stage'] = logs['plant']['stage'][:-1]
+    del logs['root']['root_depth']
+    logs['stem']['new_field'] = [0]
+
+    divergences = compare_logs(expected, logs, '1985_350')
+    by_field = {f'{d["component"]}.{d["field"]}': d for d in divergences}
+    assert set(by_field) == {'leaf.lai', 'plant.stage', 'root.root_depth', 'stem.new_field'}
+    assert by_field['leaf.lai']['days'] == [41]
+    assert by_field['plant.stage']['reason'].startswith('length')
+    assert by_field['root.root_depth']['reason'] == 'missing'
+    report = divergence_report(divergences)
+    assert '1985_350 leaf.lai: values, 1 days from day 41' in report
+
+    # Tolerances apply per field, then per field name, then to every field
+    assert 'leaf.lai' not in [f'{d["component"]}.{d["field"]}' for d in
+                              compare_logs(expected, logs, tolerances={'leaf.lai': (0, 1e-5)})]
+    assert len(compare_logs(expected, logs, tolerances={'lai': (1e-3, 0)})) == 3
+    assert len(compare_logs(expected, logs, tolerances={'*': (1e-3, 0)})) == 3
@@ -0,0 +1,47 @@
+import datetime
+import pytest
+
+from scenarios import Scenario, scenario_grid, scenario_season, co2_drivers
+from sim_runner import scenario_runner
+from regression import load_golden, compare_logs
+from weather import season_weather
+
+def test_scenario_weather():
+    sow_date = datetime.date(1985, 5, 22)
+    season = season_weather(1985, sow_date)
+    warm = scenario_season(Scenario('warm', temperature_delta=2, radiation_factor=0.9), 1985, sow_date)
+    assert warm['maxt'][10] == pytest.approx(season['maxt'][10] + 2)
+    assert warm['mint'][10] == pytest.approx(season['mint'][10] + 2)
+    assert warm['radn'][10] == pytest.approx(season['radn'][10] * 0.9)
+    assert warm['rain'] == season['rain']
+
+    # CO2 series, cached per scenario
+    tables = ((350, 700, 1000), (1, 1.37, 1.6))
+    rising = Scenario('rising', co2_concentration={1980: 340, 1990: 360})
+    drivers = co2_drivers(rising, 1985, sow_date, *tables)
+    assert drivers is co2_drivers(Scenario('same', co2_concentration={1990: 360, 1980: 340}), 1985, sow_date, *tables)
+    assert 350 < drivers['co2_concentration'][0] < drivers['co2_concentration'][-1] < 352
+    assert len(drivers['co2_factor']) == len(season['maxt'])
+    daily = Scenario('daily', co2_concentration=[400, 500]).co2_series(sow_date, 4)
+    assert list(daily) == [400, 500, 500, 500]
+
+def test_scenario_runner():
+    # Unchanged weather reproduces the golden logs exactly
+    golden = load_golden()
+    logs = scenario_runner([Scenario('350'), Scenario('700', co2_concentration=700)], [1985, 2005])
+    for year in [1985, 2005]:
+        for co2_concentration in [350, 700]:
+            assert compare_logs(golden['logs'][f'{year}_{co2_concentration}'],
+                                logs[(str(co2_concentration), year)]) == []
+
+    grid = scenario_grid(temperature_deltas=(0, 3), co2_concentrations=(350, 550))
+    assert [scenario.name for scenario in grid] == ['T+0_R1_CO2_350', 'T+0_R1_CO2_550', 'T+3_R1_CO2_350',
+                                                    'T+3_R1_CO2_550']
+    logs = scenario_runner(grid, [1985])
+    final = {name: plant_logs['plant']['biomass_total'][-1] for (name, year), plant_logs in logs.items()}
+    assert final['T+0_R1_CO2_550'] > final['T+0_R1_CO2_350']
+    assert logs[('T+3_R1_CO2_350', 1985)]['plant']['stage'] != logs[('T+0_R1_CO2_350', 1985)]['plant']['stage']
+
+    # Results are keyed by name, so scenarios can't share one
+    with pytest.raises(ValueError, match='warm'):
+        scenario_runner([Scenario('warm', temperature_delta=1), Scenario('warm', temperature_delta=2)], [1985])
@@ -0,0 +1,51 @@
+import json
+import numpy as np
+import pytest
+
+from soil_water import SoilWater
+from sim_runner import sim_runner
+
+def _load_file(fname):
+    with open(fname) as f:
+        return json.load(f)
+
+def test_soil_water_balance():
+    soil = SoilWater(_load_file('data_files/soil_data.json'), n=3)
+    start = soil.sw.sum(axis=1)
+
+    # Water is conserved through infiltration and drainage
+    rain = np.array([0, 20, 200])
+    drainage = soil.infiltrate(rain)
+    assert soil.sw.sum(axis=1) + drainage == pytest.approx(start + rain)
+    assert np.all(soil.sw <= soil.sat + 1e-9)
+    assert drainage[2] > drainage[0]
+
+    # Roots only draw on the layers they reach
+    shallow = soil.conditions([100, 100, 100])
+    deep = soil.conditions([1000, 1000, 1000])
+    assert np.all(deep['soil_water'] > shallow['soil_water'])
+    before = soil.sw.copy()
+    soil.extract([1, 1, 1], [100, 100, 100])
+    assert (before - soil.sw)[:, 1:].sum() == 0
+    assert (before - soil.sw).sum(axis=1) == pytest.approx([1, 1, 1])
+
+    # Evaporation stops at the lower limit and under a full canopy
+    for day in range(100):
+        soil.evaporate([25, 25, 25], [30, 30, 30], [15, 15, 15], [0, 0, 100])
+    assert soil.sw[0, 0] == pytest.approx(soil.ll[0])
+    assert soil.sw[2, 0] > soil.ll[0]
+
+def test_water_balance_runner():
+    logs = sim_runner(1985, water_balance=True)
+    assert logs['plant']['stage'][-1] >= 9
+    assert 0 < min(factor for factor in logs['plant']['water_deficiency_factor'] if factor) < 1
+    assert logs['root']['root_depth'][-1] > logs['root']['root_depth'][0]
+    # Demand is in mm/day, like the soil supply, so the crop is stressed on some days but not starved
+    demand = np.array([demand for demand in logs['plant']['water_demand'] if demand])
+    assert 1 < np.median(demand) < 20
+    deficiency = np.array([factor for factor in logs['plant']['water_deficiency_factor'] if factor])
+    assert 0.1 < deficiency.mean() < 0.9
+    expansion = np.array(logs['plant']['water_stress_expansion'])
+    assert expansion.max() == 1 and 0 < expansion.mean() < 1
+    unlimited = sim_runner(1985)['plant']['biomass_total'][-1]
+    assert 0.05 * unlimited < logs['plant']['biomass_total'][-1] < 0.9 * unlimited
@@ -0,0 +1,40 @@
+import datetime
+import numpy as np
+import pytest
+
+from weather_generator import WeatherGenerator, read_met, sample_seasons
+from sim_runner import ensemble_runner
+
+def test_weather_generator():
+    header, columns = read_met()
+    assert header['tav'] == 9.697991
+    generator = WeatherGenerator(header, columns)
+    sample = generator.sample(200, seed=0)
+    for label in ['year', 'day', 'radn', 'maxt', 'mint', 'rain', 'snow', 'vp', 'dayL']:
+        assert sample[label].shape == (200, 365)
+
+    # Statistics close to the record
+    observed = columns['year'] != 1979
+    assert ((sample['maxt'] + sample['mint']) / 2).mean() == pytest.approx(header['tav'], abs=0.5)
+    for label in ['maxt', 'mint', 'radn']:
+        assert sample[label].std() == pytest.approx(columns[label][observed].std(), rel=0.1)
+    assert (sample['rain'] > 0).mean() == pytest.approx((columns['rain'][observed] >= 0.1).mean(), abs=0.02)
+    assert np.all(sample['mint'] <= sample['maxt'])
+    assert np.all(sample['radn'] >= 0)
+
+    # Same seed, same weather
+    assert np.array_equal(generator.sample(3, seed=1)['maxt'], generator.sample(3, seed=1)['maxt'])
+
+def test_ensemble_runner():
+    sample = WeatherGenerator.from_met().sample(5, seed=0)
+    sow_date = datetime.date(2001, 5, 22)
+    seasons = sample_seasons(sample, sow_date)
+    assert len(seasons) == 5
+    assert len(seasons[0]['maxt']) == 365 - 140
+    leap_seasons = sample_seasons(sample, datetime.date(2000, 5, 22))
+    assert leap_seasons[0]['maxt'] == seasons[0]['maxt']
+    results = ensemble_runner(sample, sow_date, phenology_only=True)
+    assert all(result['phase_days']['maturity'] is not None for result in results)
+    logs = ensemble_runner(sample, sow_date)
+    assert len(logs) == 5
+    assert all(plant_logs['plant']['biomass_total'][-1] > 0 for plant_logs in logs)
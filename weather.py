@@ -0,0 +1,45 @@
+import json
+import datetime
+import functools
+
+WEATHER_FILE = 'data_files/weather_data_colorado.json'
+
+# Site names accepted wherever a weather file is chosen by site
+SITES = {'colorado': WEATHER_FILE}
+
+
+@functools.lru_cache(maxsize=None)
+def load_weather(fname=WEATHER_FILE):
+    """Loads a parsed .met weather file once, as (labels, {year: rows of the file's raw strings})"""
+    with open(fname) as f:
+        weather_data = json.load(f)
+    labels = tuple(weather_data.pop(0))
+    units = weather_data.pop(0)
+    years = {}
+    for row in weather_data:
+        years.setdefault(str(row[0]), []).append(tuple(row))
+    return labels, {year: tuple(rows) for year, rows in years.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def season_weather(year, sow_date, fname=WEATHER_FILE):
+    """Returns the weather from the sowing date to the end of the year as {label: tuple of floats}"""
+    labels, years = load_weather(fname)
+    weather_data = years.get(str(year))
+    if not weather_data:
+        raise Exception("No data found for given year")
+    ny = datetime.date.fromisoformat(f'{year}-01-01')
+    sow_julian = sow_date - ny
+    season_data = weather_data[sow_julian.days - 1:]
+    return {label: tuple(float(row[i]) for row in season_data) for i, label in enumerate(labels)}
+
+
+def get_env_conditions(season, step_day, co2_concentration, soil_water=1e10):
+    """Builds the env_conditions dict that Plant.step expects for one day of a season"""
+    return {'air_temp_max': season['maxt'][step_day],
+            'air_temp_min': season['mint'][step_day],
+            'snow_height': season['snow'][step_day],
+            'soil_water': soil_water,
+            'total_radiation': season['radn'][step_day],
+            'co2_concentration': co2_concentration,
+            'day_length': season['dayL'][step_day]}
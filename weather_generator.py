@@ -0,0 +1,173 @@
+import math
+import datetime
+import numpy as np
+
+MET_FILE = 'weather_data/USA_Colorado.met.txt'
+N_DAYS = 365
+WET_DAY_THRESHOLD = 0.1  # mm
+
+
+def read_met(fpath=MET_FILE):
+    """Reads a .met file into its header values and a dict of numpy columns"""
+    with open(fpath) as f:
+        lines = f.read().splitlines()
+    header = {}
+    rows = []
+    labels = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('!') or line.startswith('['):
+            continue
+        if '=' in line:
+            key, value = line.split('=', 1)
+            value = value.split('!')[0].split()
+            try:
+                header[key.strip()] = float(value[0])
+            except (ValueError, IndexError):
+                header[key.strip()] = ' '.join(value)
+        elif labels is None:
+            labels = line.split()
+        elif line.startswith('('):
+            continue  # Units
+        else:
+            rows.append([float(value) for value in line.split()])
+    data = np.array(rows)
+    return header, {label: data[:, i] for i, label in enumerate(labels)}
+
+
+def _harmonic(doy, values):
+    """Least squares fit of values ~ a0 + a1 * cos(w * doy) + b1 * sin(w * doy), one annual harmonic"""
+    w = 2 * math.pi / N_DAYS
+    basis = np.stack([np.ones(len(doy)), np.cos(w * doy), np.sin(w * doy)], axis=1)
+    coefs, *_ = np.linalg.lstsq(basis, values, rcond=None)
+    return coefs
+
+
+def _evaluate_harmonic(coefs, doy):
+    w = 2 * math.pi / N_DAYS
+    return coefs[0] + coefs[1] * np.cos(w * doy) + coefs[2] * np.sin(w * doy)
+
+
+def _month(doy):
+    """Month index (0-11) of each day of a non-leap year"""
+    dates = [datetime.date(2001, 1, 1) + datetime.timedelta(days=int(d) - 1) for d in doy]
+    return np.array([date.month - 1 for date in dates])
+
+
+class WeatherGenerator:
+
+    def __init__(self, header, columns, skip_years=(1979,)):
+        """Stochastic weather fitted to the records of a .met file, skipping skip_years (1979 is an average year)"""
+        keep = ~np.isin(columns['year'], skip_years) & (columns['day'] <= N_DAYS)
+        columns = {label: values[keep] for label, values in columns.items()}
+        doy = columns['day']
+        months = _month(np.arange(1, N_DAYS + 1))
+        record_months = months[doy.astype(int) - 1]
+        self.tav = header['tav']
+        self.amp = header['amp']
+
+        # Annual cycle of each temperature and radiation, with the mean temperature anchored to tav and amp
+        t_mean = (columns['maxt'] + columns['mint']) / 2
+        a0, a1, b1 = _harmonic(doy, t_mean)
+        phase = math.atan2(b1, a1)
+        self.t_mean_coefs = np.array([self.tav, self.amp / 2 * math.cos(phase), self.amp / 2 * math.sin(phase)])
+        self.t_range_coefs = _harmonic(doy, columns['maxt'] - columns['mint'])
+        self.radn_coefs = _harmonic(doy, columns['radn'])
+        climate = self._climate(doy)
+
+        # Anomalies standardized by month
+        anomalies = np.stack([columns[label] - climate[label] for label in ['maxt', 'mint', 'radn']], axis=1)
+        self.anomaly_std = np.array([anomalies[record_months == m].std(axis=0) for m in range(12)])
+        z = anomalies / self.anomaly_std[record_months]
+
+        # Lag-0 and lag-1 covariances of consecutive days within each year
+        consecutive = (columns['year'][1:] == columns['year'][:-1])
+        z0, z1 = z[:-1][consecutive], z[1:][consecutive]
+        m0 = z0.T @ z0 / len(z0)
+        m1 = z1.T @ z0 / len(z0)
+        self.ar_a = m1 @ np.linalg.inv(m0)
+        self.ar_b = np.linalg.cholesky(m0 - self.ar_a @ m1.T)
+
+        # Rain occurrence and amounts by month
+        wet = columns['rain'] >= WET_DAY_THRESHOLD
+        previous_wet, today_wet = wet[:-1][consecutive], wet[1:][consecutive]
+        today_months = record_months[1:][consecutive]
+        self.p_wet_after_dry = np.zeros(12)
+        self.p_wet_after_wet = np.zeros(12)
+        self.rain_shape = np.zeros(12)
+        self.rain_scale = np.zeros(12)
+        for m in range(12):
+            in_month = today_months == m
+            self.p_wet_after_dry[m] = today_wet[in_month & ~previous_wet].mean()
+            self.p_wet_after_wet[m] = today_wet[in_month & previous_wet].mean()
+            amounts = columns['rain'][wet & (record_months == m)]
+            mean, var = amounts.mean(), amounts.var()
+            self.rain_shape[m] = mean ** 2 / var
+            self.rain_scale[m] = var / mean
+
+        # Daily means of the remaining columns
+        self.daily_means = {}
+        for label in ['snow', 'vp', 'dayL']:
+            self.daily_means[label] = np.bincount(doy.astype(int) - 1, columns[label], N_DAYS + 1)[:N_DAYS] / \
+                                      np.bincount(doy.astype(int) - 1, minlength=N_DAYS + 1)[:N_DAYS]
+        self.months = months
+
+    @classmethod
+    def from_met(cls, fpath=MET_FILE, **kwargs):
+        header, columns = read_met(fpath)
+        return cls(header, columns, **kwargs)
+
+    def _climate(self, doy):
+        t_mean = _evaluate_harmonic(self.t_mean_coefs, doy)
+        t_range = _evaluate_harmonic(self.t_range_coefs, doy)
+        return {'maxt': t_mean + t_range / 2,
+                'mint': t_mean - t_range / 2,
+                'radn': _evaluate_harmonic(self.radn_coefs, doy)}
+
+    def sample(self, n_years, seed=None):
+        """Samples n_years synthetic years at once, as {.met label: array of shape (n_years, 365)}"""
+        rng = np.random.default_rng(seed)
+        doy = np.arange(1, N_DAYS + 1)
+        months = self.months
+
+        # Temperature and radiation anomalies, stepped through the year for all years at once
+        noise = rng.standard_normal((N_DAYS, n_years, 3))
+        z = np.empty((N_DAYS, n_years, 3))
+        z[0] = noise[0]
+        for day in range(1, N_DAYS):
+            z[day] = z[day - 1] @ self.ar_a.T + noise[day] @ self.ar_b.T
+        anomalies = z * self.anomaly_std[months][:, None, :]
+        climate = self._climate(doy)
+        maxt = climate['maxt'][:, None] + anomalies[:, :, 0]
+        mint = climate['mint'][:, None] + anomalies[:, :, 1]
+        radn = np.maximum(climate['radn'][:, None] + anomalies[:, :, 2], 0)
+        mint = np.minimum(mint, maxt)
+
+        # Rain
+        uniform = rng.random((N_DAYS, n_years))
+        wet = np.empty((N_DAYS, n_years), dtype=bool)
+        wet[0] = uniform[0] < self.p_wet_after_dry[0]
+        for day in range(1, N_DAYS):
+            m = months[day]
+            wet[day] = uniform[day] < np.where(wet[day - 1], self.p_wet_after_wet[m], self.p_wet_after_dry[m])
+        amounts = rng.gamma(self.rain_shape[months][:, None], self.rain_scale[months][:, None], (N_DAYS, n_years))
+        rain = np.where(wet, np.maximum(amounts, WET_DAY_THRESHOLD), 0)
+
+        sample = {'year': np.repeat(np.arange(1, n_years + 1)[:, None], N_DAYS, axis=1),
+                  'day': np.repeat(doy[None, :], n_years, axis=0),
+                  'radn': radn.T,
+                  'maxt': maxt.T,
+                  'mint': mint.T,
+                  'rain': rain.T}
+        for label, values in self.daily_means.items():
+            sample[label] = np.repeat(values[None, :], n_years, axis=0)
+        return sample
+
+
+def sample_seasons(sample, sow_date):
+    """Splits a sample into seasons from the sowing date, taken in a non-leap year, as weather.season_weather does"""
+    sow_date = datetime.date(2001, sow_date.month, min(sow_date.day, 28) if sow_date.month == 2 else sow_date.day)
+    sow_julian = sow_date - datetime.date(sow_date.year, 1, 1)
+    n_years = len(sample['maxt'])
+    return [{label: values[i, sow_julian.days - 1:].tolist() for label, values in sample.items()}
+            for i in range(n_years)]